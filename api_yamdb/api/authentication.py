@@ -0,0 +1,153 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import DEFERRED
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.versions import bump_version, get_cache, get_version, is_shared
+from reviews.models import User
+
+VERSION_KEY = 'auth:user:{}:version'
+# эпоха сбрасывает версии всех пользователей сразу
+EPOCH_KEY = 'auth:epoch'
+VERSION_CLAIM = 'user_version'
+# поля пользователя, которые токен несёт в claims
+USER_CLAIMS = ('username', 'role', 'is_superuser')
+
+
+class UserCache:
+    """Кеш пользователей в памяти процесса с коротким временем жизни.
+
+    Версия пользователя хранится в общем кеше версий: сохранение или
+    удаление пользователя (сигналы в api.signals) увеличивает её, и
+    закешированные копии и выданные токены во всех процессах перестают
+    использоваться. Загрузка данных командами пишет пользователей в обход
+    сигналов и сбрасывает версии всех пользователей (`invalidate_all`).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = {}
+
+    @property
+    def cache(self):
+        return get_cache()
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 30)
+
+    def get_version(self, user_id):
+        epoch = get_version(self.cache, EPOCH_KEY)
+        version = get_version(self.cache, VERSION_KEY.format(user_id))
+        return f'{epoch}:{version}'
+
+    def get(self, user_id, version):
+        with self.lock:
+            entry = self.users.get(user_id)
+        if entry is None:
+            return None
+        user, cached_version, expires = entry
+        if cached_version != version or expires < time.monotonic():
+            return None
+        # запрос может менять атрибуты пользователя - отдаём копию
+        return copy.copy(user)
+
+    def set(self, user, version):
+        if not self.timeout:
+            return
+        with self.lock:
+            self.users[user.pk] = (
+                user, version, time.monotonic() + self.timeout
+            )
+
+    def invalidate(self, user_id):
+        bump_version(self.cache, VERSION_KEY.format(user_id))
+        with self.lock:
+            self.users.pop(user_id, None)
+
+    def invalidate_on_commit(self, user_id):
+        transaction.on_commit(lambda: self.invalidate(user_id))
+
+    def invalidate_all(self):
+        bump_version(self.cache, EPOCH_KEY)
+        with self.lock:
+            self.users.clear()
+
+
+user_cache = UserCache()
+
+
+def check_settings():
+    """Роль из claims проверяется только по версии: без общего кеша
+    версий воркер не узнает о смене роли в другом воркере."""
+    if (getattr(settings, 'AUTH_USER_FROM_CLAIMS', False)
+            and not is_shared(user_cache.cache)):
+        raise ImproperlyConfigured(
+            'AUTH_USER_FROM_CLAIMS требует общего для процессов кеша '
+            'VERSION_CACHE_ALIAS, а не LocMemCache или DummyCache'
+        )
+
+
+def get_access_token(user):
+    """Access-токен с версией пользователя и его полями в claims."""
+    token = AccessToken.for_user(user)
+    token[VERSION_CLAIM] = user_cache.get_version(user.pk)
+    for name in USER_CLAIMS:
+        token[name] = getattr(user, name)
+    return token
+
+
+def user_from_claims(token):
+    """Пользователь из claims токена, без запроса к БД.
+
+    Остальные поля отложены (deferred): обращение к ним загрузит их из БД,
+    а save() сохранит только поля из токена.
+    """
+    values = {
+        api_settings.USER_ID_FIELD: token[api_settings.USER_ID_CLAIM],
+        'is_active': True,
+        **{name: token[name] for name in USER_CLAIMS},
+    }
+    fields = User._meta.concrete_fields
+    return User.from_db(
+        'default',
+        [field.attname for field in fields],
+        [values.get(field.attname, DEFERRED) for field in fields],
+    )
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication без запроса пользователя к БД на каждый запрос.
+
+    Пользователь берётся из кеша процесса (AUTH_USER_CACHE_TIMEOUT
+    секунд), а с AUTH_USER_FROM_CLAIMS - прямо из claims токена, если
+    версия пользователя с момента выдачи токена не менялась.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                'Token contained no recognizable user identification'
+            )
+        version = user_cache.get_version(user_id)
+        if (
+            getattr(settings, 'AUTH_USER_FROM_CLAIMS', False)
+            and validated_token.get(VERSION_CLAIM) == version
+            and all(name in validated_token for name in USER_CLAIMS)
+        ):
+            return user_from_claims(validated_token)
+        user = user_cache.get(user_id, version)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user, version)
+        return user
@@ -0,0 +1,194 @@
+import threading
+from bisect import bisect_left, insort
+
+from django.db import DatabaseError, transaction
+
+from api.versions import bump_version, get_cache, get_version
+from reviews.models import Category, Genre, Title
+
+VERSION_KEY = 'autocomplete:version'
+# запись журнала изменений, поднявшая версию до указанной
+EVENT_KEY = 'autocomplete:event:{}'
+# на сколько версий процесс догоняет журналом, а не перестройкой
+MAX_EVENTS = 100
+EVENT_TIMEOUT = 60 * 60
+# сколько совпадений просматривается для ранжирования на одну позицию top-k
+SCAN_FACTOR = 20
+
+
+def normalize(text):
+    return text.casefold().replace('ё', 'е')
+
+
+def word_suffixes(name):
+    """Ключи для поиска по началу любого слова названия."""
+    words = normalize(name).split()
+    return [' '.join(words[idx:]) for idx in range(len(words))]
+
+
+class AutocompleteIndex:
+    """Префиксный индекс названий категорий, жанров и произведений.
+
+    Хранит отсортированный список ключей `(суффикс названия, тип, id)`:
+    поиск по префиксу - бинарный поиск и просмотр соседних ключей, без
+    обращения к базе. Индекс строится при старте процесса (wsgi.py,
+    asgi.py). Сигналы сохранения и удаления моделей (api.signals)
+    поднимают версию в общем кеше версий и кладут под новой версией
+    запись журнала: перед поиском процесс применяет записи, которых у
+    него ещё нет. Целиком индекс перестраивается, только если записи
+    не хватает: после invalidate() (загрузка данных командами),
+    вытеснения из кеша или отставания больше MAX_EVENTS версий.
+    Запись в обход моделей (queryset.update, SQL) индекс не замечает.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keys = []
+        self.entries = {}
+        self.version = None
+
+    @property
+    def cache(self):
+        return get_cache()
+
+    def load(self):
+        entries = {}
+        for kind, queryset, identifier in (
+            ('category', Category.objects.all(), 'slug'),
+            ('genre', Genre.objects.all(), 'slug'),
+            ('title', Title.objects.all(), 'id'),
+        ):
+            for ident, name in queryset.values_list(identifier, 'name'):
+                entries[(kind, ident)] = name
+        keys = sorted(
+            (key, kind, ident)
+            for (kind, ident), name in entries.items()
+            for key in word_suffixes(name)
+        )
+        return entries, keys
+
+    def reload(self, version):
+        entries, keys = self.load()
+        with self.lock:
+            self.entries, self.keys, self.version = entries, keys, version
+
+    def ensure_fresh(self):
+        version = get_version(self.cache, VERSION_KEY)
+        current = self.version
+        if version == current:
+            return
+        if current is not None and 0 < version - current <= MAX_EVENTS:
+            keys = [
+                EVENT_KEY.format(number)
+                for number in range(current + 1, version + 1)
+            ]
+            events = self.cache.get_many(keys)
+            # записи нет и в промежутке между incr версии и записью
+            # журнала - тогда индекс просто перестраивается
+            if len(events) == len(keys):
+                with self.lock:
+                    if self.version == current:
+                        for key in keys:
+                            self.apply(events[key])
+                        self.version = version
+                return
+        self.reload(version)
+
+    def warm_up(self):
+        """Строит индекс при старте процесса.
+
+        До migrate таблиц ещё нет - тогда индекс строится при первом
+        поиске.
+        """
+        try:
+            self.ensure_fresh()
+        except DatabaseError:
+            pass
+
+    def invalidate(self):
+        """Индекс перестроится во всех процессах при следующем поиске."""
+        bump_version(self.cache, VERSION_KEY)
+        with self.lock:
+            self.version = None
+
+    def discard(self, kind, ident):
+        name = self.entries.pop((kind, ident), None)
+        if name is None:
+            return
+        for key in word_suffixes(name):
+            position = bisect_left(self.keys, (key, kind, ident))
+            if (position < len(self.keys)
+                    and self.keys[position] == (key, kind, ident)):
+                del self.keys[position]
+
+    def apply(self, changes):
+        """Применяет записи `(тип, id, название)`; None - удаление."""
+        for kind, ident, name in changes:
+            self.discard(kind, ident)
+            if name is None:
+                continue
+            self.entries[(kind, ident)] = name
+            for key in word_suffixes(name):
+                insort(self.keys, (key, kind, ident))
+
+    def record(self, changes):
+        """Кладёт изменения в журнал под следующей версией.
+
+        Свою копию процесс обновляет так же, как остальные, - журналом
+        в ensure_fresh(), поэтому изменения применяются везде в порядке
+        версий.
+        """
+        if not changes:
+            return
+        version = bump_version(self.cache, VERSION_KEY)
+        if version is not None:
+            self.cache.set(EVENT_KEY.format(version), changes, EVENT_TIMEOUT)
+
+    def put(self, kind, ident, name):
+        self.record([(kind, ident, name)])
+
+    def put_many(self, items):
+        """Добавляет или заменяет записи `(тип, id, название)`.
+
+        Вся пачка - одна запись журнала и одна новая версия.
+        """
+        self.record(list(items))
+
+    def remove(self, kind, ident):
+        self.record([(kind, ident, None)])
+
+    def put_on_commit(self, kind, ident, name):
+        transaction.on_commit(lambda: self.put(kind, ident, name))
+
+    def put_many_on_commit(self, items):
+        transaction.on_commit(lambda: self.put_many(items))
+
+    def remove_on_commit(self, kind, ident):
+        transaction.on_commit(lambda: self.remove(kind, ident))
+
+    def search(self, query, kinds=None, limit=10):
+        prefix = normalize(' '.join(query.split()))
+        if not prefix:
+            return []
+        self.ensure_fresh()
+        found = {}
+        with self.lock:
+            position = bisect_left(self.keys, (prefix,))
+            while (position < len(self.keys)
+                   and len(found) < limit * SCAN_FACTOR):
+                key, kind, ident = self.keys[position]
+                if not key.startswith(prefix):
+                    break
+                position += 1
+                if kinds and kind not in kinds:
+                    continue
+                name = self.entries[(kind, ident)]
+                # совпадение с начала названия важнее совпадения со слова
+                rank = (key != word_suffixes(name)[0], len(name), name)
+                if rank < found.get((kind, ident), (True, float('inf'))):
+                    found[(kind, ident)] = rank
+        best = sorted(found.items(), key=lambda item: item[1])[:limit]
+        return [(kind, ident, rank[2]) for (kind, ident), rank in best]
+
+
+autocomplete_index = AutocompleteIndex()
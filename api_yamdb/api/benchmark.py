@@ -0,0 +1,339 @@
+"""Нагрузочный прогон всех маршрутов api: запросы к БД, задержка, память.
+
+Используется командой `manage.py benchmark`: `seed` заполняет базу
+синтетическими данными, `run` прогоняет сценарии через тестовый клиент
+Django, `compare` сравнивает результат с сохранённым базовым.
+"""
+import itertools
+import math
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable
+
+from django.contrib.auth.tokens import default_token_generator
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.test import APIClient
+
+from api.authentication import get_access_token
+from reviews import dataset
+from reviews.models import Category, Comment, Genre, Review, Title, User
+
+API_PREFIX = '/api/v1/'
+# запросов к БД сравниваются точно, время и память - с допуском
+TIMED_METRICS = ('p50_ms', 'p99_ms', 'peak_kb')
+
+
+@dataclass
+class Scenario:
+    """Запрос к маршруту `route`; prepare(шаг) -> (путь, данные).
+
+    prepare может создавать нужные запросу объекты: это не измеряется.
+    """
+    name: str
+    route: str
+    method: str
+    role: str
+    prepare: Callable
+
+
+def seed(titles, reviews, comments, users=1000, seed=0):
+    """Заполняет пустую базу набором `reviews.dataset`.
+
+    Возвращает пользователей, от имени которых идут запросы, по ролям.
+    """
+    clients = {
+        role: User.objects.create_user(
+            username=f'bench-{role}', email=f'bench-{role}@yamdb.fake',
+            role=role,
+        )
+        for role in User.Role.values
+    }
+    dataset.generate(users, titles, reviews, comments, seed=seed)
+    return clients
+
+
+def get_clients(users):
+    clients = {'anon': APIClient()}
+    for role, user in users.items():
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {get_access_token(user)}'
+        )
+        clients[role] = client
+    return clients
+
+
+def new_title(step):
+    return Title.objects.create(
+        name=f'Bench title {step}', year=2000, category_id=1
+    )
+
+
+def new_review(title, author, score=5):
+    review = Review.objects.create(
+        title=title, author=author, text='Отзыв', score=score
+    )
+    Title.objects.filter(pk=title.pk).shift_rating(1, score)
+    return review
+
+
+def get_scenarios(users):
+    user = users[User.Role.USER]
+    # самое обсуждаемое произведение
+    title = Title.objects.order_by('-review_count', 'id').first()
+    review = Review.objects.filter(title=title).order_by('id').first()
+    comment = Comment.objects.filter(review=review).order_by('id').first()
+    title_url = f'titles/{title.id}/'
+    reviews_url = f'{title_url}reviews/'
+    review_url = f'{reviews_url}{review.id}/'
+    comments_url = f'{review_url}comments/'
+    comment_url = f'{comments_url}{comment.id}/' if comment else None
+
+    def static(path, data=None):
+        return lambda step: (path, data)
+
+    def create_user(step):
+        return User.objects.create_user(
+            username=f'bench-tmp-{step}', email=f'bench-tmp-{step}@y.fake'
+        )
+
+    def delete_review(step):
+        created = new_review(new_title(step), user)
+        return f'titles/{created.title_id}/reviews/{created.id}/', None
+
+    def delete_category(step):
+        created = Category.objects.create(
+            name='Категория', slug=f'bench-del-{step}'
+        )
+        return f'categories/{created.slug}/', None
+
+    def delete_genre(step):
+        created = Genre.objects.create(name='Жанр', slug=f'bench-del-{step}')
+        return f'genres/{created.slug}/', None
+
+    def token_request(step):
+        new_user = create_user(step)
+        return 'auth/token/', {
+            'username': new_user.username,
+            'confirmation_code': default_token_generator.make_token(
+                new_user
+            ),
+        }
+
+    def bulk_reviews(step):
+        target = new_title(step)
+        authors = User.objects.exclude(
+            username__startswith='bench-'
+        ).order_by('id')[:5]
+        return 'moderation/reviews/delete/', {'ids': [
+            new_review(target, author).id for author in authors
+        ]}
+
+    def bulk_comments(step):
+        return 'moderation/comments/delete/', {'ids': [
+            Comment.objects.create(review=review, author=user, text='x').id
+            for _ in range(5)
+        ]}
+
+    def new_comment_url(step):
+        created = Comment.objects.create(
+            review=review, author=user, text='x'
+        )
+        return f'{comments_url}{created.id}/', None
+
+    return [
+        Scenario('users list', 'user-list', 'get', 'admin',
+                 static('users/')),
+        Scenario('users create', 'user-list', 'post', 'admin',
+                 lambda step: ('users/', {
+                     'username': f'bench-new-{step}',
+                     'email': f'bench-new-{step}@yamdb.fake',
+                 })),
+        Scenario('user detail', 'user-detail', 'get', 'admin',
+                 static(f'users/{user.username}/')),
+        Scenario('user update', 'user-detail', 'patch', 'admin',
+                 lambda step: (f'users/{create_user(step).username}/',
+                               {'bio': 'bio'})),
+        Scenario('user delete', 'user-detail', 'delete', 'admin',
+                 lambda step: (f'users/{create_user(step).username}/',
+                               None)),
+        Scenario('me', 'user-me', 'get', 'user', static('users/me/')),
+        Scenario('me update', 'user-me', 'patch', 'user',
+                 static('users/me/', {'bio': 'bio'})),
+        Scenario('categories list', 'category-list', 'get', 'anon',
+                 static('categories/')),
+        Scenario('category create', 'category-list', 'post', 'admin',
+                 lambda step: ('categories/', {
+                     'name': 'Категория', 'slug': f'bench-{step}'
+                 })),
+        Scenario('category delete', 'category-detail', 'delete', 'admin',
+                 delete_category),
+        Scenario('genres list', 'genre-list', 'get', 'anon',
+                 static('genres/')),
+        Scenario('genre create', 'genre-list', 'post', 'admin',
+                 lambda step: ('genres/', {
+                     'name': 'Жанр', 'slug': f'bench-{step}'
+                 })),
+        Scenario('genre delete', 'genre-detail', 'delete', 'admin',
+                 delete_genre),
+        Scenario('titles list', 'title-list', 'get', 'anon',
+                 static('titles/')),
+        Scenario('titles by genre', 'title-list', 'get', 'anon',
+                 static('titles/?genre=genre-1,genre-2')),
+        Scenario('titles top', 'title-list', 'get', 'anon',
+                 static('titles/?ordering=-rating&category=category-1')),
+        Scenario('titles search', 'title-list', 'get', 'anon',
+                 static('titles/?search=фильм')),
+        Scenario('title create', 'title-list', 'post', 'admin',
+                 lambda step: ('titles/', {
+                     'name': f'Новое {step}', 'year': 2000,
+                     'category': 'category-1', 'genre': ['genre-1'],
+                 })),
+        Scenario('title detail', 'title-detail', 'get', 'anon',
+                 static(title_url)),
+        Scenario('title update', 'title-detail', 'patch', 'admin',
+                 static(title_url, {'description': 'Описание'})),
+        Scenario('title delete', 'title-detail', 'delete', 'admin',
+                 lambda step: (f'titles/{new_title(step).id}/', None)),
+        Scenario('titles bulk', 'title-bulk', 'post', 'admin',
+                 static('titles/bulk/', [
+                     {'name': f'Пачка {idx}', 'year': 2000,
+                      'category': 'category-1', 'genre': ['genre-1']}
+                     for idx in range(10)
+                 ])),
+        Scenario('reviews list', 'reviews-list', 'get', 'anon',
+                 static(reviews_url)),
+        Scenario('review create', 'reviews-list', 'post', 'user',
+                 lambda step: (f'titles/{new_title(step).id}/reviews/', {
+                     'text': 'Отзыв', 'score': 7
+                 })),
+        Scenario('review detail', 'reviews-detail', 'get', 'anon',
+                 static(review_url)),
+        Scenario('review update', 'reviews-detail', 'patch', 'moderator',
+                 static(review_url, {'text': 'Отзыв'})),
+        Scenario('review delete', 'reviews-detail', 'delete', 'moderator',
+                 delete_review),
+        Scenario('comments list', 'comments-list', 'get', 'anon',
+                 static(comments_url)),
+        Scenario('comment create', 'comments-list', 'post', 'user',
+                 static(comments_url, {'text': 'Комментарий'})),
+        Scenario('comment detail', 'comments-detail', 'get', 'anon',
+                 new_comment_url if comment_url is None
+                 else static(comment_url)),
+        Scenario('comment update', 'comments-detail', 'patch', 'moderator',
+                 lambda step: (new_comment_url(step)[0], {'text': 'y'})),
+        Scenario('comment delete', 'comments-detail', 'delete',
+                 'moderator', new_comment_url),
+        Scenario('signup', 'signup', 'post', 'anon',
+                 lambda step: ('auth/signup/', {
+                     'username': f'bench-signup-{step}',
+                     'email': f'bench-signup-{step}@yamdb.fake',
+                 })),
+        Scenario('token', 'token_obtain_pair', 'post', 'anon',
+                 token_request),
+        Scenario('autocomplete', 'autocomplete', 'get', 'anon',
+                 static('autocomplete/?q=фил')),
+        Scenario('metrics', 'metrics', 'get', 'admin', static('metrics/')),
+        Scenario('bulk delete reviews', 'bulk_delete_reviews', 'post',
+                 'moderator', bulk_reviews),
+        Scenario('bulk delete comments', 'bulk_delete_comments', 'post',
+                 'moderator', bulk_comments),
+    ]
+
+
+def get_route_names(patterns=None):
+    """Имена всех маршрутов api."""
+    if patterns is None:
+        patterns = get_resolver('api.urls').url_patterns
+    names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            names |= get_route_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+
+def request(client, scenario, step):
+    path, data = scenario.prepare(step)
+    send = getattr(client, scenario.method)
+    with CaptureQueriesContext(connection) as context:
+        started = time.perf_counter()
+        response = send(API_PREFIX + path, data=data, format='json')
+        elapsed = time.perf_counter() - started
+    if response.status_code >= 400:
+        raise RuntimeError(
+            f'{scenario.name}: {scenario.method.upper()} {path} -> '
+            f'{response.status_code} {getattr(response, "data", "")}'
+        )
+    return elapsed, len(context.captured_queries)
+
+
+def measure(scenario, client, repeat, steps):
+    timings, queries = [], []
+    for _ in range(repeat):
+        elapsed, count = request(client, scenario, next(steps))
+        timings.append(elapsed * 1000)
+        queries.append(count)
+    # отдельный прогон под tracemalloc: он искажает время
+    tracemalloc.start()
+    try:
+        request(client, scenario, next(steps))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'route': scenario.route,
+        'queries': max(queries),
+        'p50_ms': round(statistics.median(timings), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run(users, repeat):
+    """Прогоняет все сценарии, возвращает метрики по имени сценария."""
+    scenarios = get_scenarios(users)
+    uncovered = get_route_names() - {
+        scenario.route for scenario in scenarios
+    }
+    if uncovered:
+        raise RuntimeError(
+            f'Нет сценариев для маршрутов: {", ".join(sorted(uncovered))}'
+        )
+    clients = get_clients(users)
+    steps = itertools.count()
+    return {
+        scenario.name: measure(
+            scenario, clients[scenario.role], repeat, steps
+        )
+        for scenario in scenarios
+    }
+
+
+def compare(baseline, current, threshold):
+    """Регрессии `current` относительно `baseline` в виде строк."""
+    regressions = []
+    for name, before in baseline.items():
+        after = current.get(name)
+        if after is None:
+            continue
+        if after['queries'] > before['queries']:
+            regressions.append(
+                f'{name}: запросов {before["queries"]} -> {after["queries"]}'
+            )
+        for metric in TIMED_METRICS:
+            if after[metric] > before[metric] * (1 + threshold):
+                regressions.append(
+                    f'{name}: {metric} {before[metric]} -> {after[metric]}'
+                )
+    return regressions
@@ -0,0 +1,114 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import permissions
+from rest_framework.response import Response
+
+from api import metrics
+from api.versions import (get_namespace_version, touch_namespaces,
+                          touch_namespaces_on_commit)
+
+
+class ResponseCache:
+    """Кеш ответов read-only эндпоинтов поверх бэкенда Django.
+
+    Ключ ответа содержит версию пространства имён (`titles`, `genres`,
+    ...) из api.versions, поэтому инвалидация сводится к смене версии:
+    старые записи перестают читаться и вытесняются бэкендом. Версии
+    меняются и при выключенном кеше - по ним строятся ETag.
+    """
+
+    def __init__(self, alias=None):
+        self._alias = alias
+
+    @property
+    def alias(self):
+        if self._alias is not None:
+            return self._alias
+        return getattr(settings, 'RESPONSE_CACHE_ALIAS', None)
+
+    @property
+    def enabled(self):
+        return bool(self.alias)
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_version(self, namespace):
+        return get_namespace_version(namespace)
+
+    def invalidate(self, *namespaces):
+        touch_namespaces(*namespaces)
+
+    def invalidate_on_commit(self, *namespaces):
+        touch_namespaces_on_commit(*namespaces)
+
+    def make_key(self, request, namespace):
+        user = request.user
+        if user.is_authenticated:
+            role = f'{user.role}:{int(user.is_superuser)}'
+        else:
+            role = 'anonymous'
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        digest = hashlib.md5(
+            f'{request.path}?{query}|{role}'.encode()
+        ).hexdigest()
+        return f'response:{namespace}:{self.get_version(namespace)}:{digest}'
+
+    def fetch(self, request, namespace, handler, *args, **kwargs):
+        if not self.enabled:
+            return handler(request, *args, **kwargs)
+        key = self.make_key(request, namespace)
+        started = time.perf_counter()
+        cached = self.cache.get(key)
+        metrics.RESPONSE_CACHE_DURATION.observe(
+            time.perf_counter() - started, namespace=namespace
+        )
+        metrics.RESPONSE_CACHE.inc(
+            namespace=namespace, result='miss' if cached is None else 'hit'
+        )
+        if cached is not None:
+            data, status = cached
+            return Response(data, status=status, headers={'X-Cache': 'HIT'})
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            self.cache.set(key, (response.data, response.status_code))
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+response_cache = ResponseCache()
+
+
+class ResponseCacheMixin:
+    """Кеширует `list` вьюсета и сбрасывает кеш после успешной записи.
+
+    `cache_namespace` - пространство имён кешируемых ответов,
+    `cache_invalidates` - пространства, которые меняет запись во вьюсет;
+    они форматируются аргументами URL (`reviews:{title_id}`).
+    """
+    cache_namespace = None
+    cache_invalidates = ()
+
+    def cached(self, handler, request, *args, **kwargs):
+        if self.cache_namespace is None:
+            return handler(request, *args, **kwargs)
+        return response_cache.fetch(
+            request, self.cache_namespace, handler, *args, **kwargs
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(super().list, request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (request.method not in permissions.SAFE_METHODS
+                and response.status_code < 400):
+            response_cache.invalidate_on_commit(*(
+                namespace.format(**self.kwargs)
+                for namespace in self.cache_invalidates
+            ))
+        return super().finalize_response(request, response, *args, **kwargs)
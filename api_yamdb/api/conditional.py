@@ -0,0 +1,67 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from api.versions import get_namespace_state
+
+
+class NotModified(Exception):
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """ETag и Last-Modified для `list` и `retrieve` без запросов к БД.
+
+    Валидаторы строятся из версий пространств имён `conditional_namespaces`
+    (api.versions), отформатированных аргументами URL: запись, меняющая
+    ответ, меняет и одну из версий. Last-Modified - время последнего
+    изменения любого из пространств. Ответ 304 отдаётся до запуска
+    обработчика и сериализатора.
+    """
+    conditional_namespaces = ()
+    conditional_actions = ('list', 'retrieve')
+
+    def get_validators(self, request):
+        if not self.conditional_namespaces:
+            return None, None
+        versions, modified = get_namespace_state(
+            namespace.format(**self.kwargs)
+            for namespace in self.conditional_namespaces
+        )
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        source = '|'.join((f'{request.path}?{query}', *map(str, versions)))
+        etag = quote_etag(hashlib.md5(source.encode()).hexdigest())
+        return etag, int(modified)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = self.last_modified = None
+        if (request.method not in ('GET', 'HEAD')
+                or self.action not in self.conditional_actions):
+            return
+        self.etag, self.last_modified = self.get_validators(request)
+        if self.etag is None:
+            return
+        response = get_conditional_response(
+            request, etag=self.etag, last_modified=self.last_modified
+        )
+        if response is not None:
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if getattr(self, 'etag', None) and response.status_code in (200, 304):
+            response['ETag'] = self.etag
+            response['Last-Modified'] = http_date(self.last_modified)
+        return response
@@ -0,0 +1,146 @@
+"""Быстрая сериализация списков только для чтения.
+
+ModelSerializer на каждый объект страницы получает экземпляр модели,
+связывает поля, вызывает get_attribute и собирает OrderedDict. Здесь
+страница читается через .values(), а сериализатор один раз на класс
+компилируется в список полей `(имя, столбец, to_representation)`:
+вложенный сериализатор читает столбцы связи с префиксом, many=True по
+ManyToMany - одним запросом на страницу, как prefetch_related. Значения
+проходят через to_representation тех же полей DRF, поэтому ответ
+совпадает с обычным побайтно.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.fields import Field
+from rest_framework.response import Response
+
+
+class NotCompilable(Exception):
+    pass
+
+
+def get_column(field, prefix=''):
+    # поле с собственным get_attribute объявляет столбец values() само
+    column = getattr(field, 'values_column', None)
+    if column is None:
+        if (type(field).get_attribute is not Field.get_attribute
+                or field.source == '*'):
+            raise NotCompilable(field.field_name)
+        column = '__'.join(field.source_attrs)
+    return prefix + column
+
+
+class CompiledSerializer:
+    """Сериализатор, скомпилированный в представление строк .values()."""
+
+    def __init__(self, serializer_class, prefix=''):
+        serializer = serializer_class()
+        self.model = serializer.Meta.model
+        self.pk_column = prefix + self.model._meta.pk.attname
+        self.columns = set()
+        self.fields = []
+        self.many = {}
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                self.add_many(name, field)
+            elif isinstance(field, serializers.BaseSerializer):
+                self.add_nested(name, field, prefix)
+            elif isinstance(field, (serializers.RelatedField,
+                                    serializers.ManyRelatedField)):
+                raise NotCompilable(name)
+            else:
+                column = get_column(field, prefix)
+                self.columns.add(column)
+                self.fields.append(('plain', name, column, field))
+
+    def add_nested(self, name, field, prefix):
+        column = prefix + get_column(field)
+        nested = CompiledSerializer(type(field), prefix=f'{column}__')
+        if nested.many:
+            raise NotCompilable(name)
+        # по внешнему ключу видно, есть ли связанный объект
+        self.columns.add(column)
+        self.columns.update(nested.columns)
+        self.fields.append(('nested', name, column, nested))
+
+    def add_many(self, name, field):
+        relation = self.model._meta.get_field(get_column(field))
+        if not relation.many_to_many or relation.auto_created:
+            raise NotCompilable(name)
+        child = CompiledSerializer(type(field.child))
+        if child.many:
+            raise NotCompilable(name)
+        self.many[name] = (relation.related_query_name(), child)
+        self.fields.append(('many', name, None, child))
+
+    def values(self, queryset):
+        # prefetch_related не работает с values(), связи читает represent
+        return queryset.prefetch_related(None).values(
+            self.pk_column, *self.columns
+        )
+
+    def fetch_many(self, name, ids):
+        query_name, child = self.many[name]
+        # тот же запрос, что у prefetch_related: порядок из Meta.ordering
+        rows = child.model.objects.filter(
+            **{f'{query_name}__in': ids}
+        ).values(query_name, *child.columns)
+        related = {}
+        for row in rows:
+            related.setdefault(row[query_name], []).append(
+                child.represent_row(row, {})
+            )
+        return related
+
+    def represent_row(self, row, related):
+        data = {}
+        for kind, name, column, field in self.fields:
+            if kind == 'many':
+                data[name] = related[name].get(row[self.pk_column], [])
+                continue
+            value = row[column]
+            if value is None:
+                data[name] = None
+            elif kind == 'nested':
+                data[name] = field.represent_row(row, {})
+            else:
+                data[name] = field.to_representation(value)
+        return data
+
+    def represent(self, rows):
+        ids = [row[self.pk_column] for row in rows]
+        related = {name: self.fetch_many(name, ids) for name in self.many}
+        return [self.represent_row(row, related) for row in rows]
+
+
+@lru_cache(maxsize=None)
+def compile_serializer(serializer_class):
+    """Скомпилированный сериализатор или None, если поле не поддержано."""
+    try:
+        return CompiledSerializer(serializer_class)
+    except NotCompilable:
+        return None
+
+
+class FastListMixin:
+    """`list` через .values() и скомпилированный сериализатор.
+
+    Выключается настройкой FAST_LIST_SERIALIZATION; сериализаторы с
+    неподдержанными полями обрабатываются обычным list.
+    """
+
+    def list(self, request, *args, **kwargs):
+        compiled = None
+        if getattr(settings, 'FAST_LIST_SERIALIZATION', True):
+            compiled = compile_serializer(self.get_serializer_class())
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+        queryset = compiled.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(compiled.represent(page))
+        return Response(compiled.represent(list(queryset)))
@@ -1,16 +1,103 @@
 import django_filters
+from django.db.models import Exists, OuterRef
+from rest_framework.filters import BaseFilterBackend
 
-from reviews.models import Title
+from reviews import leaderboards
+from reviews.models import GenreTitle, LeaderboardEntry, Title
+from reviews.search import search_titles
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+ORDERING_TOP = '-rating'
+
+
+class CharInFilter(django_filters.BaseInFilter, django_filters.CharFilter):
+    """Несколько значений через запятую: `?genre=drama,comedy`."""
 
 
 class TitleFilter(django_filters.FilterSet):
-    category = django_filters.CharFilter(
+    category = CharInFilter(
         field_name='category__slug'
     )
-    genre = django_filters.CharFilter(
-        field_name='genre__slug'
+    # жанры проверяются через EXISTS, а не JOIN: JOIN с genretitle
+    # размножал бы произведения с несколькими подходящими жанрами
+    genre = CharInFilter(method='filter_genre')
+    genre_match = django_filters.ChoiceFilter(
+        choices=((MATCH_ANY, 'любой из жанров'), (MATCH_ALL, 'все жанры')),
+        method='skip',
+    )
+    # `-rating` читает материализованный топ, если фильтры совпадают с его
+    # областью: в нём не больше LEADERBOARD_SIZE произведений с
+    # LEADERBOARD_MIN_REVIEWS отзывов
+    ordering = django_filters.ChoiceFilter(
+        choices=((ORDERING_TOP, 'по убыванию рейтинга'),),
+        method='filter_top',
     )
 
     class Meta:
         model = Title
         fields = ('year', 'name', )
+
+    def skip(self, queryset, name, value):
+        # значение читает filter_genre
+        return queryset
+
+    def filter_genre(self, queryset, name, value):
+        genres = GenreTitle.objects.filter(title=OuterRef('pk'))
+        if self.form.cleaned_data.get('genre_match') != MATCH_ALL:
+            return queryset.filter(
+                Exists(genres.filter(genre__slug__in=value))
+            )
+        for slug in set(value):
+            queryset = queryset.filter(Exists(genres.filter(genre__slug=slug)))
+        return queryset
+
+    def get_board(self):
+        """Область топа, в точности равная фильтрам запроса, или None."""
+        data = self.form.cleaned_data
+        if data.get('name') or self.request.query_params.get(
+            TitleSearchFilter.search_param, ''
+        ).strip():
+            return None
+        year = data.get('year')
+        used = [
+            (scope, set(values)) for scope, values in (
+                (LeaderboardEntry.Scope.GENRE, data.get('genre') or ()),
+                (LeaderboardEntry.Scope.CATEGORY,
+                 data.get('category') or ()),
+                (LeaderboardEntry.Scope.YEAR,
+                 () if year is None else (str(int(year)),)),
+            ) if values
+        ]
+        if not used:
+            return LeaderboardEntry.Scope.ALL, ''
+        if len(used) == 1 and len(used[0][1]) == 1:
+            scope, values = used[0]
+            return scope, values.pop()
+        return None
+
+    def filter_top(self, queryset, name, value):
+        # в топе области нет произведений за его пределами: с другими
+        # фильтрами они бы пропали, поэтому сортируется сама выборка
+        board = self.get_board()
+        if board is None:
+            return leaderboards.ranked_titles(queryset)
+        return leaderboards.top_titles(queryset, *board)
+
+
+class TitleSearchFilter(BaseFilterBackend):
+    """Полнотекстовый поиск `?search=` с сортировкой по релевантности.
+
+    С `?ordering=` поиск только отбирает произведения и не меняет порядок.
+    """
+    search_param = 'search'
+    ordering_param = 'ordering'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return search_titles(
+            queryset, query,
+            ranked=not request.query_params.get(self.ordering_param),
+        )
@@ -0,0 +1,120 @@
+import json
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from api import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет все маршруты api на синтетических данных и измеряет '
+        'запросы к БД, задержку p50/p99 и пик памяти'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=1000)
+        parser.add_argument('--reviews', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seed набора данных, см. generate_dataset',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Запросов на сценарий',
+        )
+        parser.add_argument(
+            '--output',
+            type=Path,
+            help='Сохранить результат в JSON (базовый для --compare)',
+        )
+        parser.add_argument(
+            '--compare',
+            type=Path,
+            help='Сравнить с сохранённым результатом и завершиться '
+                 'ошибкой при регрессии',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.2,
+            help='Допустимый рост времени и памяти (0.2 - на 20%%)',
+        )
+        parser.add_argument(
+            '--in-place',
+            action='store_true',
+            help='Заполнить настроенную базу, а не временную тестовую; '
+                 'база должна быть пустой',
+        )
+
+    def handle(self, *args, **options):
+        if options['titles'] < 1 or options['reviews'] < 1:
+            raise CommandError('Нужны хотя бы одно произведение и отзыв')
+        baseline = None
+        if options['compare']:
+            baseline = json.loads(
+                options['compare'].read_text(encoding='utf-8')
+            )['results']
+        if options['in_place']:
+            results = self.benchmark(options)
+        else:
+            results = self.benchmark_in_test_db(options)
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'{name:<24} queries={metrics["queries"]:<3} '
+                f'p50={metrics["p50_ms"]:.2f}ms '
+                f'p99={metrics["p99_ms"]:.2f}ms '
+                f'peak={metrics["peak_kb"]:.0f}KB'
+            )
+        if options['output']:
+            options['output'].write_text(json.dumps({
+                'scale': {
+                    name: options[name]
+                    for name in (
+                        'titles', 'reviews', 'comments', 'users', 'seed',
+                        'repeat',
+                    )
+                },
+                'results': results,
+            }, ensure_ascii=False, indent=2), encoding='utf-8')
+        if baseline is not None:
+            regressions = benchmark.compare(
+                baseline, results, options['threshold']
+            )
+            if regressions:
+                raise CommandError(
+                    'Регрессии производительности:\n' + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def benchmark_in_test_db(self, options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            return self.benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def benchmark(self, options):
+        from reviews.models import Title
+        if Title.objects.exists():
+            raise CommandError('База для прогона должна быть пустой')
+        try:
+            users = benchmark.seed(
+                options['titles'], options['reviews'], options['comments'],
+                options['users'], options['seed'],
+            )
+            return benchmark.run(users, options['repeat'])
+        except (RuntimeError, ValueError) as error:
+            raise CommandError(str(error))
@@ -0,0 +1,370 @@
+"""Метрики API в текстовом формате Prometheus.
+
+Счётчики и гистограммы пишутся в хранилище процесса: словарь в памяти
+или, если задан METRICS_MULTIPROCESS_DIR, mmap-файл `metrics_<pid>.db`
+в этом каталоге. Эндпоинт метрик суммирует файлы всех процессов, поэтому
+под gunicorn любой воркер отдаёт метрики всего сервиса. Каталог нужно
+очищать перед запуском сервиса, иначе счётчики продолжатся с прошлого
+запуска.
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+FILE_PATTERN = 'metrics_*.db'
+# заголовок файла: сколько байт занято записями
+HEADER = struct.Struct('<Q')
+KEY_LENGTH = struct.Struct('<I')
+VALUE = struct.Struct('<d')
+INITIAL_FILE_SIZE = 64 * 1024
+
+
+def align(size):
+    return size + -size % 8
+
+
+def read_entries(data, used):
+    """Записи файла: ключ, значение и смещение значения.
+
+    Запись - длина ключа, ключ, выравнивание до 8 байт и double.
+    """
+    offset = HEADER.size
+    while offset < used:
+        (length,) = KEY_LENGTH.unpack_from(data, offset)
+        start = offset + KEY_LENGTH.size
+        key = bytes(data[start:start + length]).decode()
+        offset = align(start + length)
+        yield key, VALUE.unpack_from(data, offset)[0], offset
+        offset += VALUE.size
+
+
+def read_file(path):
+    data = Path(path).read_bytes()
+    if len(data) < HEADER.size:
+        return
+    (used,) = HEADER.unpack_from(data)
+    for key, value, _ in read_entries(data, used):
+        yield key, value
+
+
+class MemoryStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, key, amount):
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def items(self):
+        with self.lock:
+            return list(self.values.items())
+
+
+class MmapStore:
+    """Значения одного процесса в mmap-файле.
+
+    Пишет только процесс-владелец; заголовок с размером обновляется
+    после записи ключа, поэтому читатели не видят недописанных записей.
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.file = open(path, 'a+b')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < INITIAL_FILE_SIZE:
+            self.file.truncate(INITIAL_FILE_SIZE)
+            size = INITIAL_FILE_SIZE
+        self.map = mmap.mmap(self.file.fileno(), size)
+        (self.used,) = HEADER.unpack_from(self.map)
+        if self.used == 0:
+            self.used = HEADER.size
+            HEADER.pack_into(self.map, 0, self.used)
+        self.positions = {
+            key: position
+            for key, _, position in read_entries(self.map, self.used)
+        }
+
+    def grow(self, needed):
+        size = len(self.map)
+        while size < needed:
+            size *= 2
+        self.map.close()
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+    def add_key(self, key):
+        encoded = key.encode()
+        start = self.used + KEY_LENGTH.size
+        position = align(start + len(encoded))
+        end = position + VALUE.size
+        if end > len(self.map):
+            self.grow(end)
+        KEY_LENGTH.pack_into(self.map, self.used, len(encoded))
+        self.map[start:start + len(encoded)] = encoded
+        VALUE.pack_into(self.map, position, 0.0)
+        self.used = end
+        HEADER.pack_into(self.map, 0, self.used)
+        self.positions[key] = position
+        return position
+
+    def inc(self, key, amount):
+        with self.lock:
+            position = self.positions.get(key)
+            if position is None:
+                position = self.add_key(key)
+            (value,) = VALUE.unpack_from(self.map, position)
+            VALUE.pack_into(self.map, position, value + amount)
+
+    def items(self):
+        with self.lock:
+            return [
+                (key, VALUE.unpack_from(self.map, position)[0])
+                for key, position in self.positions.items()
+            ]
+
+
+def escape(value):
+    return (
+        str(value).replace('\\', r'\\').replace('"', r'\"')
+        .replace('\n', r'\n')
+    )
+
+
+def format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{escape(value)}"' for name, value in pairs
+    ) + '}'
+
+
+def format_value(value):
+    value = float(value)
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.label_pairs = {}
+
+    def get_pairs(self, labels):
+        try:
+            values = tuple(labels[name] for name in self.labelnames)
+        except KeyError:
+            values = None
+        if values is None or len(labels) != len(self.labelnames):
+            raise ValueError(
+                f'{self.name}: ожидаются метки {self.labelnames}'
+            )
+        pairs = self.label_pairs.get(values)
+        if pairs is None:
+            pairs = self.label_pairs[values] = tuple(
+                zip(self.labelnames, map(str, values))
+            )
+        return pairs
+
+    def sample_key(self, suffix, pairs):
+        # по имени метрики до пробела образцы группируются при выводе
+        return f'{self.name} {self.name}{suffix}{format_labels(pairs)}'
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.keys = {}
+
+    def inc(self, amount=1, **labels):
+        pairs = self.get_pairs(labels)
+        key = self.keys.get(pairs)
+        if key is None:
+            key = self.keys[pairs] = self.sample_key('', pairs)
+        self.registry.store.inc(key, amount)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames,
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = (*buckets, float('inf'))
+        self.keys = {}
+
+    def get_keys(self, pairs):
+        """Ключи корзин, суммы и количества для набора меток."""
+        keys = self.keys.get(pairs)
+        if keys is None:
+            keys = self.keys[pairs] = (
+                [
+                    self.sample_key(
+                        '_bucket', (*pairs, ('le', format_value(bound)))
+                    )
+                    for bound in self.buckets
+                ],
+                self.sample_key('_sum', pairs),
+                self.sample_key('_count', pairs),
+            )
+        return keys
+
+    def observe(self, value, **labels):
+        buckets, sum_key, count_key = self.get_keys(self.get_pairs(labels))
+        store = self.registry.store
+        # корзины накопительные; нулевые прибавки держат их по порядку
+        for bound, key in zip(self.buckets, buckets):
+            store.inc(key, 1 if value <= bound else 0)
+        store.inc(sum_key, value)
+        store.inc(count_key, 1)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self._store = None
+        self._store_key = None
+
+    @property
+    def directory(self):
+        return getattr(settings, 'METRICS_MULTIPROCESS_DIR', None)
+
+    @property
+    def store(self):
+        # после fork воркер gunicorn открывает свой файл
+        key = (os.getpid(), self.directory)
+        if self._store_key != key:
+            with self.lock:
+                if self._store_key != key:
+                    self._store = (
+                        MmapStore(Path(key[1]) / f'metrics_{key[0]}.db')
+                        if key[1] else MemoryStore()
+                    )
+                    self._store_key = key
+        return self._store
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), **kwargs):
+        return self.register(
+            Histogram(self, name, documentation, labelnames, **kwargs)
+        )
+
+    def collect(self):
+        """Значения образцов, просуммированные по всем процессам."""
+        if not self.directory:
+            return dict(self.store.items())
+        values = {}
+        for path in sorted(Path(self.directory).glob(FILE_PATTERN)):
+            for key, value in read_file(path):
+                values[key] = values.get(key, 0.0) + value
+        return values
+
+    def expose(self):
+        samples = {}
+        for key, value in self.collect().items():
+            name, sample = key.split(' ', 1)
+            samples.setdefault(name, []).append((sample, value))
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            lines.extend(
+                f'{sample} {format_value(value)}'
+                for sample, value in samples.get(name, ())
+            )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    'api_requests_total', 'Запросы к API',
+    ('route', 'method', 'status'),
+)
+REQUEST_DURATION = registry.histogram(
+    'api_request_duration_seconds', 'Время обработки запроса',
+    ('route', 'method'),
+)
+DB_DURATION = registry.histogram(
+    'api_db_duration_seconds', 'Время запросов к БД за запрос',
+    ('route', 'method'),
+)
+DB_QUERIES = registry.histogram(
+    'api_db_queries', 'Число запросов к БД за запрос',
+    ('route', 'method'), buckets=(1, 2, 3, 5, 10, 20, 50, 100),
+)
+SERIALIZER_DURATION = registry.histogram(
+    'api_serializer_duration_seconds',
+    'Сериализация страницы списка без времени в БД', ('route',),
+)
+PAGE_NUMBER = registry.histogram(
+    'api_page_number', 'Номер запрошенной страницы списка', ('route',),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 1000),
+)
+RESPONSE_CACHE = registry.counter(
+    'api_response_cache_total', 'Обращения к кешу ответов',
+    ('namespace', 'result'),
+)
+RESPONSE_CACHE_DURATION = registry.histogram(
+    'api_response_cache_duration_seconds', 'Время чтения кеша ответов',
+    ('namespace',), buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05),
+)
+
+
+class RequestTiming:
+    """Время запроса по частям; execute_wrapper для соединений с БД.
+
+    Middleware кладёт его в `request.metrics`, пагинатор отмечает
+    номер страницы и время сериализации.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_duration = 0.0
+        self.page_number = None
+        self.serializer_duration = None
+        self.mark = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_duration += time.perf_counter() - started
+
+    def page_served(self, page_number):
+        self.page_number = page_number
+        self.mark = (time.perf_counter(), self.db_duration)
+
+    def serialized(self):
+        if self.mark is None:
+            return
+        started, db_duration = self.mark
+        self.serializer_duration = (
+            time.perf_counter() - started
+            - (self.db_duration - db_duration)
+        )
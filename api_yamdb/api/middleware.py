@@ -0,0 +1,177 @@
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from api import metrics
+
+logger = logging.getLogger('api.sql')
+
+# списки параметров разной длины и числа в LIMIT/OFFSET не меняют форму
+PLACEHOLDER_LIST = re.compile(r'%s(?:\s*,\s*%s)*')
+VALUES_LIST = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+NUMBER = re.compile(r'\b\d+\b')
+
+
+def query_shape(sql):
+    """Запрос без значений: одинаковые формы - признак N+1."""
+    shape = PLACEHOLDER_LIST.sub('...', sql)
+    shape = VALUES_LIST.sub('(...)', shape)
+    return NUMBER.sub('?', shape)
+
+
+def get_view_name(request):
+    """Вьюсет и действие (`TitleViewSet.list`) или имя представления."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return request.path
+    cls = getattr(match.func, 'cls', None)
+    if cls is None:
+        return match.view_name
+    action = (getattr(match.func, 'actions', None) or {}).get(
+        request.method.lower()
+    )
+    return f'{cls.__name__}.{action}' if action else cls.__name__
+
+
+class QueryRecorder:
+    """execute_wrapper: число и суммарное время запросов, медленные запросы.
+
+    Тексты запросов только считаются, формы вычисляются один раз
+    на каждый разный текст в конце запроса.
+    """
+
+    def __init__(self, slow_ms):
+        self.slow_seconds = slow_ms / 1000
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            self.statements[sql] += 1
+            if elapsed >= self.slow_seconds:
+                self.slow.append((elapsed, sql))
+
+    def duplicates(self, threshold):
+        """Формы запросов, выполненные не меньше `threshold` раз."""
+        shapes = Counter()
+        for sql, count in self.statements.items():
+            shapes[query_shape(sql)] += count
+        return [
+            (shape, count) for shape, count in shapes.most_common()
+            if count >= threshold
+        ]
+
+
+class QueryInstrumentationMiddleware:
+    """Считает запросы к БД и время в БД для доли запросов.
+
+    Доля задаётся SQL_INSTRUMENTATION_SAMPLE_RATE. Для выбранных запросов
+    в ответ добавляется заголовок Server-Timing, в лог `api.sql` пишутся
+    запросы дольше SQL_SLOW_QUERY_MS и формы запросов, повторённые не
+    меньше SQL_DUPLICATE_QUERIES раз (N+1). Остальные запросы проходят
+    без обёрток.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def sampled(self):
+        rate = getattr(settings, 'SQL_INSTRUMENTATION_SAMPLE_RATE', 0)
+        return rate >= 1 or random.random() < rate
+
+    def __call__(self, request):
+        if not self.sampled():
+            return self.get_response(request)
+        recorder = QueryRecorder(getattr(settings, 'SQL_SLOW_QUERY_MS', 100))
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        self.report(request, recorder)
+        response['Server-Timing'] = (
+            f'db;dur={recorder.duration * 1000:.1f};'
+            f'desc="{recorder.count} queries", '
+            f'total;dur={total * 1000:.1f}'
+        )
+        return response
+
+    def report(self, request, recorder):
+        view = get_view_name(request)
+        for elapsed, sql in recorder.slow:
+            logger.warning(
+                'Медленный запрос в %s: %.1f мс: %s',
+                view, elapsed * 1000, sql,
+            )
+        threshold = getattr(settings, 'SQL_DUPLICATE_QUERIES', 5)
+        for shape, count in recorder.duplicates(threshold):
+            logger.warning(
+                'Повторяющийся запрос (N+1) в %s: %d раз: %s',
+                view, count, shape,
+            )
+        logger.debug(
+            '%s %s (%s): %d запросов, %.1f мс в БД',
+            request.method, request.path, view, recorder.count,
+            recorder.duration * 1000,
+        )
+
+
+def get_route_name(request):
+    """Имя маршрута из api/urls.py; ограничивает число значений метки."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.url_name:
+        return 'unmatched'
+    return match.url_name
+
+
+class MetricsMiddleware:
+    """Счётчики и гистограммы каждого запроса, см. `api.metrics`."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return self.get_response(request)
+        timing = request.metrics = metrics.RequestTiming()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timing))
+            response = self.get_response(request)
+        route = get_route_name(request)
+        method = request.method
+        metrics.REQUESTS.inc(
+            route=route, method=method, status=response.status_code
+        )
+        metrics.REQUEST_DURATION.observe(
+            time.perf_counter() - started, route=route, method=method
+        )
+        metrics.DB_DURATION.observe(
+            timing.db_duration, route=route, method=method
+        )
+        metrics.DB_QUERIES.observe(
+            timing.queries, route=route, method=method
+        )
+        if timing.serializer_duration is not None:
+            metrics.SERIALIZER_DURATION.observe(
+                timing.serializer_duration, route=route
+            )
+        if timing.page_number is not None:
+            metrics.PAGE_NUMBER.observe(timing.page_number, route=route)
+        return response
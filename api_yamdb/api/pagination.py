@@ -0,0 +1,100 @@
+from rest_framework import pagination
+
+MAX_PAGE_SIZE = 100
+
+
+class TimedPaginationMixin:
+    """Отмечает в метриках запроса номер страницы и время сериализации.
+
+    Вьюсет сериализует страницу между paginate_queryset и
+    get_paginated_response.
+    """
+
+    def get_page_depth(self):
+        return None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = super().paginate_queryset(queryset, request, view)
+        self.timing = getattr(request, 'metrics', None)
+        if self.timing is not None and page is not None:
+            self.timing.page_served(self.get_page_depth())
+        return page
+
+    def get_paginated_response(self, data):
+        if getattr(self, 'timing', None) is not None:
+            self.timing.serialized()
+        return super().get_paginated_response(data)
+
+
+class PageSizePagination(TimedPaginationMixin,
+                         pagination.PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+    def get_page_depth(self):
+        return self.page.number
+
+
+class KeysetPagination(TimedPaginationMixin, pagination.CursorPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class PageOrCursorPagination(pagination.BasePagination):
+    """Постраничная пагинация по умолчанию, курсорная по запросу.
+
+    Курсорный режим включается параметром `?pagination=cursor`
+    (или наличием `cursor`) и не выполняет COUNT(*) и OFFSET. Курсор
+    задаёт свой порядок `cursor_ordering`, поэтому с параметрами из
+    `ordering_query_params`, которые задают порядок выдачи, остаётся
+    постраничная пагинация.
+    """
+    mode_query_param = 'pagination'
+    cursor_ordering = ('id',)
+    ordering_query_params = ()
+
+    def is_ordered(self, request):
+        return any(
+            request.query_params.get(param, '').strip()
+            for param in self.ordering_query_params
+        )
+
+    def get_paginator(self, request):
+        if ((request.query_params.get(self.mode_query_param) == 'cursor'
+                or KeysetPagination.cursor_query_param
+                in request.query_params)
+                and not self.is_ordered(request)):
+            paginator = KeysetPagination()
+            paginator.ordering = self.cursor_ordering
+            return paginator
+        return PageSizePagination()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return PageSizePagination().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return PageSizePagination().get_schema_operation_parameters(view)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    @property
+    def display_page_controls(self):
+        return self.paginator.display_page_controls
+
+
+class TitlePagination(PageOrCursorPagination):
+    cursor_ordering = ('id',)
+    # топ по рейтингу и релевантность поиска, см. api.filters
+    ordering_query_params = ('ordering', 'search')
+
+
+class PublicationPagination(PageOrCursorPagination):
+    cursor_ordering = ('pub_date', 'id')
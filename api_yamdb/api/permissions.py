@@ -8,8 +8,9 @@ class IsAuthorOrModeratorOrAdmin(permissions.BasePermission):
             return True
         if not user.is_authenticated:
             return False
-        if user.is_admin_role or user.is_moderator_role or obj.author == user:
-            return True
+        # author_id, а не author: сравнение объектов загрузило бы автора
+        return (user.is_admin_role or user.is_moderator_role
+                or obj.author_id == user.pk)
 
 
 class IsAdmin(permissions.BasePermission):
@@ -24,3 +25,14 @@ class IsAdmin(permissions.BasePermission):
 class ReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.method in permissions.SAFE_METHODS
+
+
+class IsModeratorOrAdmin(permissions.BasePermission):
+    message = 'Требуются права модератора или администратора.'
+
+    def has_permission(self, request, view):
+        user = request.user
+        return user.is_authenticated and (
+            user.is_moderator_role or user.is_admin_role
+            or user.is_superuser
+        )
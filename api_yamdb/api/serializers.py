@@ -8,6 +8,17 @@ from reviews.models import (Category, Comment, Genre,
                             Review, Title, User)
 
 
+class AuthorUsernameField(serializers.ReadOnlyField):
+    """Имя автора из аннотации `author_username` без загрузки User."""
+    values_column = 'author__username'
+
+    def get_attribute(self, instance):
+        username = getattr(instance, 'author_username', None)
+        if username is None:
+            return instance.author.username
+        return username
+
+
 class CategorySerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -31,7 +42,10 @@ class TitleGetSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Title
-        fields = '__all__'
+        fields = (
+            'id', 'name', 'year', 'rating', 'description', 'genre',
+            'category'
+        )
 
 
 class TitleCreateSerializer(serializers.ModelSerializer):
@@ -47,7 +61,7 @@ class TitleCreateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Title
-        fields = '__all__'
+        fields = ('id', 'name', 'year', 'description', 'genre', 'category')
 
     def validate_year(self, value):
         year = dt.date.today().year
@@ -57,10 +71,34 @@ class TitleCreateSerializer(serializers.ModelSerializer):
         return value
 
 
+class TitleBulkItemSerializer(TitleCreateSerializer):
+    """Элемент массовой записи произведений.
+
+    Категории и жанры ищутся не запросом на каждый слаг, а в словарях
+    `categories` и `genres` из context, загруженных для всей пачки.
+    """
+    id = serializers.IntegerField(min_value=1, required=False)
+    category = serializers.SlugField()
+    genre = serializers.ListField(child=serializers.SlugField())
+
+    def resolve(self, objects, slug):
+        if slug not in objects:
+            raise serializers.ValidationError(
+                serializers.SlugRelatedField.default_error_messages[
+                    'does_not_exist'
+                ].format(slug_name='slug', value=slug)
+            )
+        return objects[slug]
+
+    def validate_category(self, value):
+        return self.resolve(self.context['categories'], value)
+
+    def validate_genre(self, value):
+        return [self.resolve(self.context['genres'], slug) for slug in value]
+
+
 class ReviewSerializer(serializers.ModelSerializer):
-    author = serializers.StringRelatedField(
-        read_only=True
-    )
+    author = AuthorUsernameField()
 
     class Meta:
         model = Review
@@ -80,9 +118,7 @@ class ReviewSerializer(serializers.ModelSerializer):
 
 
 class CommentSerializer(serializers.ModelSerializer):
-    author = serializers.StringRelatedField(
-        read_only=True
-    )
+    author = AuthorUsernameField()
 
     class Meta:
         model = Comment
@@ -133,3 +169,61 @@ class TokenSerializer(serializers.ModelSerializer):
             'username',
             'confirmation_code'
         )
+
+
+class AutocompleteQuerySerializer(serializers.Serializer):
+    KINDS = ('category', 'genre', 'title')
+
+    q = serializers.CharField(max_length=100, trim_whitespace=True)
+    type = serializers.CharField(required=False, default='')
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+    def validate_type(self, value):
+        kinds = {kind.strip() for kind in value.split(',') if kind.strip()}
+        unknown = kinds - set(self.KINDS)
+        if unknown:
+            raise serializers.ValidationError(
+                f'Неизвестный тип: {", ".join(sorted(unknown))}'
+            )
+        return kinds
+
+
+class BulkModerationSerializer(serializers.Serializer):
+    """Отбор отзывов или комментариев для массового удаления."""
+    MAX_IDS = 1000
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False, max_length=MAX_IDS, required=False
+    )
+    author = serializers.SlugRelatedField(
+        slug_field='username', queryset=User.objects.all(), required=False
+    )
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+
+    def validate(self, data):
+        # удалять всё за период без автора слишком опасно
+        if 'ids' not in data and 'author' not in data:
+            raise serializers.ValidationError(
+                'Укажите ids или author.'
+            )
+        if data.get('since') and data.get('until') and (
+            data['since'] > data['until']
+        ):
+            raise serializers.ValidationError(
+                'since должно быть не позже until.'
+            )
+        return data
+
+    def filter_queryset(self, queryset):
+        data = self.validated_data
+        if 'ids' in data:
+            queryset = queryset.filter(pk__in=data['ids'])
+        if 'author' in data:
+            queryset = queryset.filter(author=data['author'])
+        if 'since' in data:
+            queryset = queryset.filter(pub_date__gte=data['since'])
+        if 'until' in data:
+            queryset = queryset.filter(pub_date__lte=data['until'])
+        return queryset
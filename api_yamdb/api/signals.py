@@ -0,0 +1,47 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.authentication import user_cache
+from api.autocomplete import autocomplete_index
+from api.versions import touch_namespaces
+from reviews.models import Category, Genre, Title, User
+from reviews.signals import data_loaded
+
+# тип записи автодополнения и поле, которым она обозначается
+AUTOCOMPLETE_ENTRIES = {
+    Category: ('category', 'slug'),
+    Genre: ('genre', 'slug'),
+    Title: ('title', 'id'),
+}
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    # роль и имя есть в кеше процессов и в claims токенов; сигнал
+    # срабатывает и при правке из админки или shell
+    user_cache.invalidate_on_commit(instance.pk)
+
+
+def put_autocomplete(sender, instance, **kwargs):
+    kind, identifier = AUTOCOMPLETE_ENTRIES[sender]
+    autocomplete_index.put_on_commit(
+        kind, getattr(instance, identifier), instance.name
+    )
+
+
+def remove_autocomplete(sender, instance, **kwargs):
+    kind, identifier = AUTOCOMPLETE_ENTRIES[sender]
+    autocomplete_index.remove_on_commit(kind, getattr(instance, identifier))
+
+
+for model in AUTOCOMPLETE_ENTRIES:
+    post_save.connect(put_autocomplete, sender=model)
+    post_delete.connect(remove_autocomplete, sender=model)
+
+
+@receiver(data_loaded)
+def invalidate_loaded(sender, **kwargs):
+    # пользователи тоже записаны пачкой, без post_save и post_delete
+    user_cache.invalidate_all()
+    touch_namespaces('categories', 'genres', 'titles', 'publications')
+    autocomplete_index.invalidate()
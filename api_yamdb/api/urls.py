@@ -2,9 +2,10 @@ from django.urls import include, path
 
 from rest_framework.routers import SimpleRouter
 
-from .views import (CategoryViewSet, GenreViewSet, TitleViewSet,
-                    RegistrationView, UserViewSet, TokenView,
-                    ReviewViewSet, CommentViewSet)
+from .views import (AutocompleteView, BulkDeleteCommentsView,
+                    BulkDeleteReviewsView, CategoryViewSet, GenreViewSet,
+                    MetricsView, TitleViewSet, RegistrationView, UserViewSet,
+                    TokenView, ReviewViewSet, CommentViewSet)
 
 
 router = SimpleRouter()
@@ -27,4 +28,16 @@ urlpatterns = [
     path('v1/', include(router.urls)),
     path('v1/auth/signup/', RegistrationView.as_view(), name='signup'),
     path('v1/auth/token/', TokenView.as_view(), name='token_obtain_pair'),
+    path(
+        'v1/autocomplete/', AutocompleteView.as_view(), name='autocomplete'
+    ),
+    path('v1/metrics/', MetricsView.as_view(), name='metrics'),
+    path(
+        'v1/moderation/reviews/delete/', BulkDeleteReviewsView.as_view(),
+        name='bulk_delete_reviews'
+    ),
+    path(
+        'v1/moderation/comments/delete/', BulkDeleteCommentsView.as_view(),
+        name='bulk_delete_comments'
+    ),
 ]
@@ -0,0 +1,109 @@
+"""Счётчики версий в кеше Django.
+
+Запись увеличивает версию ключа (`bump_version`), читатели сравнивают её
+со своей копией и так узнают, что копия устарела. Версии хранятся в кеше
+VERSION_CACHE_ALIAS: он должен быть общим для всех процессов и уметь
+атомарный incr (memcached), иначе одновременные записи могут оставить
+одну и ту же версию.
+
+Версии пространств имён (`titles`, `reviews:<id произведения>`, ...)
+служат ключами кеша ответов и ETag; рядом хранится время последнего
+изменения для Last-Modified. Пространства с id объекта делятся на
+NAMESPACE_PARTITIONS групп, поэтому число ключей не растёт с данными.
+"""
+import time
+import zlib
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+NAMESPACE_PARTITIONS = 1024
+
+
+def get_cache():
+    return caches[getattr(settings, 'VERSION_CACHE_ALIAS', 'default')]
+
+
+def is_shared(cache):
+    """Видят ли другие процессы версии, записанные в этот кеш."""
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def check_shared_versions(app_configs, **kwargs):
+    if settings.DEBUG or is_shared(get_cache()):
+        return []
+    return [checks.Warning(
+        'Кеш версий VERSION_CACHE_ALIAS хранится в памяти процесса: '
+        'воркеры не увидят изменений друг друга',
+        hint='Задайте MEMCACHED_LOCATION или общий кеш с атомарным incr',
+        id='api.W001',
+    )]
+
+
+def get_version(cache, key):
+    version = cache.get(key)
+    if version is None:
+        # после очистки кеша версия не должна совпасть с прежней
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(cache, key):
+    """Увеличивает версию; None, если ключа не было и версия начата заново."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
+        return None
+
+
+def namespace_key(namespace):
+    name, _, ident = namespace.partition(':')
+    if not ident:
+        return name
+    # объекты одной группы делят версию: запись в один из них меняет
+    # ETag и у остальных, зато ключей не больше NAMESPACE_PARTITIONS
+    return f'{name}:{zlib.crc32(ident.encode()) % NAMESPACE_PARTITIONS}'
+
+
+def get_namespace_version(namespace):
+    return get_version(get_cache(), f'version:{namespace_key(namespace)}')
+
+
+def get_namespace_state(namespaces):
+    """Версии пространств имён и время последнего изменения любого из них.
+
+    Одно обращение к кешу, если все ключи уже есть.
+    """
+    cache = get_cache()
+    names = [namespace_key(namespace) for namespace in namespaces]
+    keys = [f'version:{name}' for name in names]
+    modified_keys = [f'modified:{name}' for name in names]
+    values = cache.get_many([*keys, *modified_keys])
+    versions = [
+        values[key] if key in values else get_version(cache, key)
+        for key in keys
+    ]
+    missing = {key: time.time() for key in modified_keys if key not in values}
+    if missing:
+        cache.set_many(missing, None)
+    modified = max(values.get(key, missing.get(key)) for key in modified_keys)
+    return versions, modified
+
+
+def touch_namespaces(*namespaces):
+    """Отмечает изменение данных пространств имён."""
+    cache = get_cache()
+    names = {namespace_key(namespace) for namespace in namespaces}
+    for name in names:
+        bump_version(cache, f'version:{name}')
+    cache.set_many({f'modified:{name}': time.time() for name in names}, None)
+
+
+def touch_namespaces_on_commit(*namespaces):
+    transaction.on_commit(lambda: touch_namespaces(*namespaces))
@@ -1,32 +1,48 @@
 from django.contrib.auth.tokens import default_token_generator
-from django.db.models import Avg
-from django.core.mail import send_mail
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
 
 from django_filters.rest_framework import DjangoFilterBackend
 
 from rest_framework import filters, mixins, viewsets, views, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.decorators import action
 from rest_framework.generics import CreateAPIView
 from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 
-from api.filters import TitleFilter
+from api.authentication import get_access_token
+from api import metrics
+from api.autocomplete import autocomplete_index
+from api.cache import ResponseCacheMixin, response_cache
+from api.conditional import ConditionalGetMixin
+from api.fast_list import FastListMixin
+from api.filters import TitleFilter, TitleSearchFilter
+from api.pagination import PublicationPagination, TitlePagination
 from api.permissions import (IsAdmin, ReadOnly,
-                             IsAuthorOrModeratorOrAdmin)
-from api.serializers import (CategorySerializer, CommentSerializer,
+                             IsAuthorOrModeratorOrAdmin, IsModeratorOrAdmin)
+from api.serializers import (AutocompleteQuerySerializer,
+                             BulkModerationSerializer,
+                             TitleBulkItemSerializer,
+                             CategorySerializer, CommentSerializer,
                              GenreSerializer, ReviewSerializer,
                              TitleGetSerializer, TitleCreateSerializer,
                              UserSerializer, TokenSerializer)
-from reviews.models import Category, Genre, Title, Review, User, Comment
+from reviews import leaderboards, outbox
+from reviews.models import (Category, Genre, GenreTitle, LeaderboardEntry,
+                            Title, Review, User, Comment)
+from reviews.utils import batched
 
 
 ALLOWED_METHODS = ['get', 'post', 'patch', 'delete']
+MAX_BULK_TITLES = 1000
 
 
-class ListCreateDestroyViewSet(mixins.ListModelMixin,
+class ListCreateDestroyViewSet(ResponseCacheMixin,
+                               mixins.ListModelMixin,
                                mixins.CreateModelMixin,
                                mixins.DestroyModelMixin,
                                viewsets.GenericViewSet):
@@ -36,70 +52,312 @@ class ListCreateDestroyViewSet(mixins.ListModelMixin,
     search_fields = ('name',)
 
 
+class NestedListMixin:
+    """Проверяет родительский объект, только если список оказался пуст.
+
+    `parent_model` - модель родителя, `parent_lookups` - её поля и
+    аргументы URL, по которым ищется родитель (`{'pk': 'title_id'}`).
+    """
+    parent_model = None
+    parent_lookups = {}
+
+    def get_parent_filter(self):
+        return {
+            field: self.kwargs.get(kwarg)
+            for field, kwarg in self.parent_lookups.items()
+        }
+
+    def get_parent(self):
+        return get_object_or_404(self.parent_model, **self.get_parent_filter())
+
+    def parent_exists(self):
+        return self.parent_model.objects.filter(
+            **self.get_parent_filter()
+        ).exists()
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if not page and not self.parent_exists():
+            raise Http404
+        return page
+
+
 class CategoryViewSet(ListCreateDestroyViewSet):
     queryset = Category.objects.all().order_by('id')
     serializer_class = CategorySerializer
+    cache_namespace = 'categories'
+    cache_invalidates = ('categories', 'titles')
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        leaderboards.drop_board(
+            LeaderboardEntry.Scope.CATEGORY, instance.slug
+        )
+        super().perform_destroy(instance)
 
 
 class GenreViewSet(ListCreateDestroyViewSet):
     queryset = Genre.objects.all().order_by('id')
     serializer_class = GenreSerializer
+    cache_namespace = 'genres'
+    cache_invalidates = ('genres', 'titles')
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        leaderboards.drop_board(LeaderboardEntry.Scope.GENRE, instance.slug)
+        super().perform_destroy(instance)
 
 
-class TitleViewSet(viewsets.ModelViewSet):
-    queryset = Title.objects.annotate(
-        rating=Avg('review__score')
-    ).order_by('id')
+class TitleViewSet(ConditionalGetMixin, ResponseCacheMixin, FastListMixin,
+                   viewsets.ModelViewSet):
+    queryset = Title.objects.with_relations().order_by('id')
     permission_classes = ((IsAdmin | ReadOnly),)
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, TitleSearchFilter)
     filterset_class = TitleFilter
+    pagination_class = TitlePagination
     http_method_names = ALLOWED_METHODS
+    cache_namespace = 'titles'
+    cache_invalidates = ('titles',)
+    conditional_namespaces = ('titles',)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(super().retrieve, request, *args, **kwargs)
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return TitleGetSerializer
         return TitleCreateSerializer
 
-
-class ReviewViewSet(viewsets.ModelViewSet):
+    @transaction.atomic
+    def perform_update(self, serializer):
+        title = serializer.save()
+        # категория, жанры или год могли смениться
+        leaderboards.update_title(title.id)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # вместе с произведением удаляются его отзывы и комментарии
+        response_cache.invalidate_on_commit(f'reviews:{instance.id}')
+        leaderboards.remove_title(instance)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Создаёт (элементы без id) и изменяет (с id) произведения пачкой.
+
+        Ошибки в элементе не мешают записать остальные элементы.
+        """
+        items = request.data
+        if not isinstance(items, list) or not 0 < len(items) <= (
+            MAX_BULK_TITLES
+        ):
+            raise ValidationError(
+                f'Ожидается список из 1-{MAX_BULK_TITLES} произведений.'
+            )
+        context = {**self.get_serializer_context(), **bulk_lookups(items)}
+        results, created, updated = [], [], []
+        seen_ids = set()
+        for index, item in enumerate(items):
+            result = {'index': index}
+            results.append(result)
+            title = None
+            if isinstance(item, dict) and 'id' in item:
+                title = context['titles'].get(parse_id(item['id']))
+                if title is None:
+                    result['errors'] = {'id': ['Произведение не найдено.']}
+                    continue
+                if title.id in seen_ids:
+                    # второе изменение того же объекта повторило бы связи
+                    # с жанрами
+                    result['errors'] = {
+                        'id': ['Произведение уже изменяется в этой пачке.']
+                    }
+                    continue
+                seen_ids.add(title.id)
+            serializer = TitleBulkItemSerializer(
+                title, data=item, partial=title is not None, context=context
+            )
+            if not serializer.is_valid():
+                result['errors'] = serializer.errors
+                continue
+            data = dict(serializer.validated_data)
+            data.pop('id', None)
+            genres = data.pop('genre', None)
+            if title is None:
+                result['status'] = 'created'
+                created.append((Title(**data), genres, result))
+            else:
+                result['status'] = 'updated'
+                for name, value in data.items():
+                    setattr(title, name, value)
+                updated.append((title, genres, result))
+        with transaction.atomic():
+            save_bulk_titles(created, updated)
+        for title, _, result in created + updated:
+            result['id'] = title.id
+        # bulk_create и bulk_update не отправляют post_save
+        autocomplete_index.put_many_on_commit([
+            ('title', title.id, title.name)
+            for title, _, _ in created + updated
+        ])
+        return Response({
+            'created': len(created),
+            'updated': len(updated),
+            'failed': len(items) - len(created) - len(updated),
+            'results': results,
+        })
+
+
+def parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def bulk_lookups(items):
+    """Категории, жанры и изменяемые произведения пачки: три запроса."""
+    categories, genres, ids = set(), set(), set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        if isinstance(item.get('category'), str):
+            categories.add(item['category'])
+        if isinstance(item.get('genre'), list):
+            genres.update(
+                slug for slug in item['genre'] if isinstance(slug, str)
+            )
+        if 'id' in item:
+            ids.add(parse_id(item['id']))
+    ids.discard(None)
+    return {
+        'categories': Category.objects.in_bulk(categories, field_name='slug'),
+        'genres': Genre.objects.in_bulk(genres, field_name='slug'),
+        'titles': Title.objects.in_bulk(ids) if ids else {},
+    }
+
+
+def bulk_insert_titles(titles):
+    if connection.features.can_return_rows_from_bulk_insert:
+        Title.objects.bulk_create(titles)
+        return
+    # SQLite в Django 3.2 не возвращает id из bulk_create. Каждая часть
+    # вставляется одним INSERT, строки которого получают id подряд, а
+    # last_insert_rowid() относится к этому соединению: чужие вставки
+    # не сдвигают прочитанные id
+    size = connection.ops.bulk_batch_size(Title._meta.concrete_fields, titles)
+    for part in batched(titles, size):
+        Title.objects.bulk_create(part)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT last_insert_rowid()')
+            last, = cursor.fetchone()
+        for pk, title in enumerate(part, last - len(part) + 1):
+            title.pk = pk
+            title._state.adding = False
+
+
+def save_bulk_titles(created, updated):
+    """Записывает пачку: bulk_create, bulk_update и связи с жанрами."""
+    bulk_insert_titles([title for title, _, _ in created])
+    if updated:
+        Title.objects.bulk_update(
+            [title for title, _, _ in updated],
+            ('name', 'year', 'description', 'category'),
+        )
+    relinked = [
+        (title, genres) for title, genres, _ in updated if genres is not None
+    ]
+    GenreTitle.objects.filter(
+        title__in=[title for title, _ in relinked]
+    ).delete()
+    GenreTitle.objects.bulk_create(
+        GenreTitle(title=title, genre=genre)
+        for title, genres in relinked + [
+            (title, genres) for title, genres, _ in created
+        ]
+        for genre in dict.fromkeys(genres)
+    )
+    for title, _, _ in updated:
+        # категория, жанры или год могли смениться; в топах бывают только
+        # произведения с достаточным числом отзывов
+        if leaderboards.is_eligible(title):
+            leaderboards.update_title(title.id)
+
+
+class ReviewViewSet(ConditionalGetMixin, ResponseCacheMixin,
+                    NestedListMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = (IsAuthorOrModeratorOrAdmin,
                           IsAuthenticatedOrReadOnly)
+    pagination_class = PublicationPagination
     http_method_names = ALLOWED_METHODS
-
-    def get_title(self):
-        title_id = self.kwargs.get('title_id')
-        return get_object_or_404(Title, pk=title_id)
+    cache_invalidates = ('titles', 'reviews:{title_id}')
+    # publications меняют записи сразу у многих произведений
+    conditional_namespaces = ('publications', 'reviews:{title_id}')
+    parent_model = Title
+    parent_lookups = {'pk': 'title_id'}
 
     def get_queryset(self):
-        return self.get_title().review.all()
+        return Review.objects.filter(
+            title_id=self.kwargs.get('title_id')
+        ).annotate(author_username=F('author__username'))
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(
+        review = serializer.save(
             author=self.request.user,
-            title=self.get_title()
+            title=self.get_parent()
+        )
+        Title.objects.filter(pk=review.title_id).shift_rating(
+            1, review.score
+        )
+        leaderboards.update_title(review.title_id)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old_score = serializer.instance.score
+        review = serializer.save()
+        if review.score != old_score:
+            Title.objects.filter(pk=review.title_id).shift_rating(
+                0, review.score - old_score
+            )
+            leaderboards.update_title(review.title_id)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        Title.objects.filter(pk=instance.title_id).shift_rating(
+            -1, -instance.score
         )
+        instance.delete()
+        leaderboards.update_title(instance.title_id)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ConditionalGetMixin, ResponseCacheMixin,
+                     NestedListMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = (IsAuthorOrModeratorOrAdmin,
                           IsAuthenticatedOrReadOnly)
+    pagination_class = PublicationPagination
     http_method_names = ALLOWED_METHODS
-
-    def get_review(self):
-        review_id = self.kwargs.get('review_id')
-        return get_object_or_404(Review, pk=review_id)
+    cache_invalidates = ('comments:{review_id}',)
+    # удаление отзыва или произведения меняет версию reviews:{title_id}
+    conditional_namespaces = (
+        'publications', 'reviews:{title_id}', 'comments:{review_id}'
+    )
+    parent_model = Review
+    parent_lookups = {'pk': 'review_id', 'title_id': 'title_id'}
 
     def get_queryset(self):
-        return self.get_review().comments.all()
+        return Comment.objects.filter(
+            review_id=self.kwargs.get('review_id'),
+            review__title_id=self.kwargs.get('title_id')
+        ).annotate(author_username=F('author__username'))
 
     def perform_create(self, serializer):
         serializer.save(
             author=self.request.user,
-            review=self.get_review()
+            review=self.get_parent()
         )
 
 
@@ -124,7 +382,24 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
     def perform_update(self, serializer):
-        serializer.save(role=self.request.user.role)
+        old_username = serializer.instance.username
+        user = serializer.save(role=self.request.user.role)
+        if user.username != old_username:
+            # имя автора входит в представление отзывов и комментариев
+            response_cache.invalidate_on_commit('publications')
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # отзывы пользователя удаляются каскадно, рейтинг их произведений
+        # нужно пересчитать
+        title_ids = list(
+            instance.review_set.values_list('title_id', flat=True)
+        )
+        instance.delete()
+        Title.objects.filter(pk__in=title_ids).rebuild_ratings()
+        for title_id in set(title_ids):
+            leaderboards.update_title(title_id)
+        response_cache.invalidate_on_commit('titles', 'publications')
 
 
 class RegistrationView(CreateAPIView):
@@ -145,12 +420,12 @@ class RegistrationView(CreateAPIView):
         )
         confirmation_code = default_token_generator.make_token(user)
 
-        send_mail(
+        # письмо отправит send_outbox: сбой SMTP не должен ломать ответ
+        outbox.enqueue(
             subject='API YaMDB, регистрация',
             message=f'Ваш код подтверждения {confirmation_code}',
             from_email='Practicum15@yandex.ru',
             recipient_list=(serializer.validated_data.get('email'),),
-            fail_silently=False,
         )
         return Response(request.data, status=status.HTTP_200_OK)
 
@@ -166,9 +441,90 @@ class TokenView(views.APIView):
         confirmation_code = data.get('confirmation_code')
         if default_token_generator.check_token(user=user,
                                                token=confirmation_code):
-            refresh = RefreshToken.for_user(user)
-            token = {'token': str(refresh.access_token)}
+            token = {'token': str(get_access_token(user))}
             return Response(token, status=status.HTTP_200_OK)
         return Response(
             {'confirmation_code': 'Не верный код'},
             status=status.HTTP_400_BAD_REQUEST)
+
+
+class AutocompleteView(views.APIView):
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        serializer = AutocompleteQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        matches = autocomplete_index.search(
+            data['q'], kinds=data['type'], limit=data['limit']
+        )
+        return Response([
+            {
+                'type': kind,
+                'name': name,
+                'id' if kind == 'title' else 'slug': ident,
+            }
+            for kind, ident, name in matches
+        ])
+
+
+class MetricsView(views.APIView):
+    """Метрики всех процессов сервиса в текстовом формате Prometheus."""
+    permission_classes = (IsAdmin,)
+
+    def get(self, request):
+        return HttpResponse(
+            metrics.registry.expose(),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+
+
+class BulkDeleteView(views.APIView):
+    """Массовое удаление по списку id или по автору и периоду.
+
+    Права проверяются один раз на запрос, удаление - одна транзакция.
+    """
+    permission_classes = (IsModeratorOrAdmin,)
+    model = None
+
+    def post(self, request):
+        serializer = BulkModerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            queryset = serializer.filter_queryset(self.model.objects.all())
+            deleted = self.delete(queryset)
+        return Response(deleted, status=status.HTTP_200_OK)
+
+    def delete(self, queryset):
+        _, deleted = queryset.delete()
+        if any(deleted.values()):
+            response_cache.invalidate_on_commit('publications')
+        return {
+            'reviews': deleted.get(Review._meta.label, 0),
+            'comments': deleted.get(Comment._meta.label, 0),
+        }
+
+
+class BulkDeleteReviewsView(BulkDeleteView):
+    model = Review
+
+    def delete(self, queryset):
+        shifts = list(
+            queryset.order_by().values('title_id').annotate(
+                count=Count('id'), total=Sum('score')
+            )
+        )
+        deleted = super().delete(queryset)
+        # рейтинг и топы каждого произведения обновляются один раз
+        for shift in shifts:
+            Title.objects.filter(pk=shift['title_id']).shift_rating(
+                -shift['count'], -shift['total']
+            )
+            leaderboards.update_title(shift['title_id'])
+        if shifts:
+            response_cache.invalidate_on_commit('titles')
+        return deleted
+
+
+class BulkDeleteCommentsView(BulkDeleteView):
+    model = Comment
@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
 
 application = get_asgi_application()
+
+# индекс автодополнения строится до первого запроса, а не во время него;
+# с gunicorn --preload воркеры получают его готовым от мастер-процесса
+from api.autocomplete import autocomplete_index  # noqa: E402
+
+autocomplete_index.warm_up()
@@ -1,3 +1,4 @@
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -30,6 +31,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,6 +74,54 @@ DATABASES = {
 }
 
 
+# Cache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # LRU в памяти процесса; для общего между воркерами кеша можно указать
+    # django.core.cache.backends.filebased.FileBasedCache или memcached
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-responses',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+    # счётчики версий (api.versions) должны быть общими для всех процессов
+    # и увеличиваться атомарно: по ним воркеры узнают об изменениях,
+    # сделанных в других воркерах. Без MEMCACHED_LOCATION версии живут в
+    # памяти процесса - так можно только с одним процессом (runserver)
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': os.environ['MEMCACHED_LOCATION'],
+        'TIMEOUT': None,
+    } if os.environ.get('MEMCACHED_LOCATION') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'versions',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
+VERSION_CACHE_ALIAS = 'versions'
+
+# None отключает кеш ответов каталога
+RESPONSE_CACHE_ALIAS = 'responses'
+
+# материализованные топы произведений (?ordering=-rating)
+LEADERBOARD_SIZE = 100
+LEADERBOARD_MIN_REVIEWS = 3
+
+# письма отправляет manage.py send_outbox; True - сразу после коммита
+EMAIL_OUTBOX_EAGER = False
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -110,13 +161,13 @@ STATICFILES_DIRS = ((BASE_DIR / 'static/'),)
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_PAGINATION_CLASS':
-        'rest_framework.pagination.PageNumberPagination',
+        'api.pagination.PageSizePagination',
     'PAGE_SIZE': 5,
 }
 
@@ -128,5 +179,28 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# секунд, сколько процесс хранит пользователя из токена; 0 - не хранить
+AUTH_USER_CACHE_TIMEOUT = 30
+# брать пользователя из claims токена, не обращаясь к БД; требует общего
+# между процессами кеша VERSION_CACHE_ALIAS
+AUTH_USER_FROM_CLAIMS = False
+
+# доля запросов, для которых api.middleware считает запросы к БД
+# и добавляет Server-Timing; 0 - выключено
+SQL_INSTRUMENTATION_SAMPLE_RATE = 0.05
+# запросы к БД дольше стольких миллисекунд пишутся в лог api.sql
+SQL_SLOW_QUERY_MS = 100
+# столько запросов одной формы за запрос пишутся в лог как N+1
+SQL_DUPLICATE_QUERIES = 5
+
+# list произведений, отзывов и комментариев через .values(), см. api.fast_list
+FAST_LIST_SERIALIZATION = True
+
+# счётчики и гистограммы запросов для /api/v1/metrics/
+METRICS_ENABLED = True
+# каталог mmap-файлов метрик воркеров gunicorn (очищать перед запуском);
+# None - метрики в памяти процесса
+METRICS_MULTIPROCESS_DIR = None
+
 if DEBUG:
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import User, Genre, Category, Title, Review, Comment
+from .models import (User, Genre, Category, Title, Review, Comment,
+                     OutgoingEmail)
 
 admin.site.register(User)
 admin.site.register(Genre)
@@ -7,3 +8,4 @@ admin.site.register(Category)
 admin.site.register(Title)
 admin.site.register(Review)
 admin.site.register(Comment)
+admin.site.register(OutgoingEmail)
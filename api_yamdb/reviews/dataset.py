@@ -0,0 +1,229 @@
+"""Синтетический набор данных для нагрузочного тестирования.
+
+Популярность распределена по закону Ципфа: k-й по популярности объект
+выбирается с весом 1 / k ** skew. Так выбираются категории и жанры
+произведений, произведения для отзывов, авторы отзывов и комментариев и
+отзывы для комментариев. Ранги популярности перемешаны относительно id.
+Все случайные величины берутся из random.Random(seed), поэтому один и тот
+же seed на пустой базе даёт одни и те же данные.
+
+Строки пишутся пачками через bulk_create с явными id, начиная со
+следующего за максимальным, поэтому генерацию можно повторять поверх
+существующих данных.
+"""
+import random
+from itertools import accumulate
+
+from django.db.models import Max
+
+from reviews import leaderboards
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title, User)
+from reviews.utils import batched
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_GENRES_PER_TITLE = 3
+FIRST_YEAR = 1950
+LAST_YEAR = 2022
+# оценки смещены к высоким, как обычно и бывает в отзывах
+SCORE_WEIGHTS = (2, 1, 1, 2, 3, 5, 8, 12, 10, 6)
+WORDS = (
+    'фильм', 'книга', 'сюжет', 'герой', 'автор', 'финал', 'жанр', 'сцена',
+    'отлично', 'скучно', 'неожиданно', 'сильно', 'слабо', 'очень', 'стоит',
+    'смотреть', 'читать', 'совет', 'история', 'мир', 'музыка', 'актёр',
+)
+
+
+def zipf_weights(count, skew):
+    """Накопленные веса рангов 0..count-1 для random.choices."""
+    return list(accumulate(1 / rank ** skew for rank in range(1, count + 1)))
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+class Generator:
+    """Генерирует и записывает набор данных; см. generate()."""
+
+    def __init__(self, seed=0, skew=1.1, batch_size=DEFAULT_BATCH_SIZE):
+        self.random = random.Random(seed)
+        self.skew = skew
+        self.batch_size = batch_size
+
+    def popular(self, ids):
+        """Перемешанные id и веса их популярности."""
+        ids = list(ids)
+        self.random.shuffle(ids)
+        return ids, zipf_weights(len(ids), self.skew)
+
+    def pick(self, population, count=1):
+        ids, weights = population
+        return self.random.choices(ids, cum_weights=weights, k=count)
+
+    def pick_distinct(self, population, count):
+        """`count` разных id с учётом популярности."""
+        ids = population[0]
+        chosen = {}
+        # выборка с возвращением, пока повторы редки; остаток - равномерно
+        for _ in range(4):
+            for pk in self.pick(population, count - len(chosen)):
+                chosen[pk] = None
+            if len(chosen) == count:
+                return list(chosen)
+        rest = [pk for pk in ids if pk not in chosen]
+        return [*chosen, *self.random.sample(rest, count - len(chosen))]
+
+    def text(self, low, high, end='.'):
+        words = self.random.choices(WORDS, k=self.random.randint(low, high))
+        return ' '.join(words).capitalize() + end
+
+    def insert(self, model, objects):
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch)
+
+    def users(self, count):
+        start = next_id(User)
+        # пароль не задан: войти под такими пользователями нельзя
+        self.insert(User, (
+            User(id=pk, username=f'user{pk}', email=f'user{pk}@yamdb.fake')
+            for pk in range(start, start + count)
+        ))
+        return range(start, start + count)
+
+    def categories(self, count):
+        start = next_id(Category)
+        self.insert(Category, (
+            Category(id=pk, name=f'Категория {pk}', slug=f'category-{pk}')
+            for pk in range(start, start + count)
+        ))
+        return range(start, start + count)
+
+    def genres(self, count):
+        start = next_id(Genre)
+        self.insert(Genre, (
+            Genre(id=pk, name=f'Жанр {pk}', slug=f'genre-{pk}')
+            for pk in range(start, start + count)
+        ))
+        return range(start, start + count)
+
+    def titles(self, count, categories, genres):
+        start = next_id(Title)
+        categories = self.popular(categories)
+        genres = self.popular(genres)
+        for ids in batched(range(start, start + count), self.batch_size):
+            titles = []
+            title_genres = []
+            for pk in ids:
+                titles.append(Title(
+                    id=pk, name=self.text(1, 4, end=''),
+                    year=self.random.randint(FIRST_YEAR, LAST_YEAR),
+                    category_id=self.pick(categories)[0],
+                    description=self.text(10, 40),
+                ))
+                size = min(
+                    self.random.randint(1, MAX_GENRES_PER_TITLE),
+                    len(genres[0]),
+                )
+                title_genres.extend(
+                    GenreTitle(title_id=pk, genre_id=genre_id)
+                    for genre_id in self.pick_distinct(genres, size)
+                )
+            Title.objects.bulk_create(titles)
+            GenreTitle.objects.bulk_create(title_genres)
+        return range(start, start + count)
+
+    def review_counts(self, count, titles, authors):
+        """Число отзывов на каждое произведение.
+
+        На произведение не больше одного отзыва от автора
+        (unique_together), поэтому отзывы сверх числа авторов уходят
+        другим произведениям.
+        """
+        if count > len(titles) * len(authors):
+            raise ValueError(
+                f'{count} отзывов не уместить: на каждое из {len(titles)} '
+                f'произведений не больше {len(authors)}'
+            )
+        titles = self.popular(titles)
+        counts = dict.fromkeys(titles[0], 0)
+        ranks = {pk: rank for rank, pk in enumerate(titles[0], 1)}
+        missing = count
+        while missing:
+            for pk in self.pick(titles, missing):
+                if counts[pk] < len(authors):
+                    counts[pk] += 1
+                    missing -= 1
+            # заполненные произведения больше не выбираются: иначе при
+            # count около titles * authors почти все выборки приходятся
+            # на них и цикл крутится впустую
+            ids = [pk for pk in titles[0] if counts[pk] < len(authors)]
+            titles = ids, list(accumulate(
+                1 / ranks[pk] ** self.skew for pk in ids
+            ))
+        return counts
+
+    def reviews(self, count, titles, authors):
+        start = next_id(Review)
+        counts = self.review_counts(count, titles, authors)
+        authors = self.popular(authors)
+
+        def generate():
+            pk = start
+            for title_id, size in counts.items():
+                for author_id in self.pick_distinct(authors, size):
+                    yield Review(
+                        id=pk, title_id=title_id, author_id=author_id,
+                        text=self.text(5, 60),
+                        score=self.random.choices(
+                            range(1, 11), weights=SCORE_WEIGHTS
+                        )[0],
+                    )
+                    pk += 1
+
+        self.insert(Review, generate())
+        return range(start, start + count)
+
+    def comments(self, count, reviews, authors):
+        start = next_id(Comment)
+        reviews = self.popular(reviews)
+        authors = self.popular(authors)
+
+        def generate():
+            for pk in range(start, start + count):
+                yield Comment(
+                    id=pk, review_id=self.pick(reviews)[0],
+                    author_id=self.pick(authors)[0],
+                    text=self.text(3, 30),
+                )
+
+        self.insert(Comment, generate())
+        return range(start, start + count)
+
+
+def generate(users, titles, reviews, comments, categories=20, genres=50,
+             seed=0, skew=1.1, batch_size=DEFAULT_BATCH_SIZE):
+    """Записывает набор данных и возвращает id созданных объектов по моделям.
+
+    Вызывается в транзакции: рейтинги и топы пересчитываются целиком.
+    """
+    if titles and not (categories and genres):
+        raise ValueError('Произведениям нужны категории и жанры')
+    generator = Generator(seed, skew, batch_size)
+    created = {User: generator.users(users)}
+    created[Category] = generator.categories(categories)
+    created[Genre] = generator.genres(genres)
+    created[Title] = generator.titles(
+        titles, created[Category], created[Genre]
+    )
+    created[Review] = generator.reviews(
+        reviews, created[Title], created[User]
+    )
+    if comments and not created[Review]:
+        raise ValueError('Комментариям нужны отзывы')
+    created[Comment] = generator.comments(
+        comments, created[Review], created[User]
+    )
+    Title.objects.rebuild_ratings()
+    leaderboards.rebuild()
+    return created
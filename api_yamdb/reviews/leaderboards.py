@@ -0,0 +1,195 @@
+"""Материализованные топы произведений по рейтингу.
+
+Топ - не больше LEADERBOARD_SIZE лучших произведений области (все
+произведения, категория, жанр, год), у которых не меньше
+LEADERBOARD_MIN_REVIEWS отзывов. Записи отзывов обновляют топы только
+этого произведения: произведение встаёт на место, если обходит последнюю
+позицию топа, а когда оно опускается на последнее место или выбывает,
+свободное место добирается одним запросом к произведениям области.
+Чтение топа - диапазон индекса `leaderboard_rank_idx`.
+"""
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+
+from reviews.models import (Category, Genre, GenreTitle, LeaderboardEntry,
+                            Title)
+
+Scope = LeaderboardEntry.Scope
+RANK_ORDERING = ('-rating', '-review_count', 'title_id')
+
+
+def get_size():
+    return getattr(settings, 'LEADERBOARD_SIZE', 100)
+
+
+def get_min_reviews():
+    return getattr(settings, 'LEADERBOARD_MIN_REVIEWS', 3)
+
+
+def get_boards(title):
+    """Топы, в которые может попасть произведение: пары (область, ключ)."""
+    boards = [(Scope.ALL, ''), (Scope.YEAR, str(title.year))]
+    if title.category_id is not None:
+        boards.append((Scope.CATEGORY, title.category.slug))
+    boards.extend(
+        (Scope.GENRE, slug)
+        for slug in title.genre.values_list('slug', flat=True)
+    )
+    # члены Scope хешируются не так, как строки из базы
+    return [(str(scope), key) for scope, key in boards]
+
+
+def is_eligible(title):
+    return (
+        title.rating is not None
+        and title.review_count >= get_min_reviews()
+    )
+
+
+def board_entries(scope, key):
+    return LeaderboardEntry.objects.filter(scope=scope, key=key)
+
+
+def board_titles(scope, key):
+    """Произведения области, которые могут попасть в топ."""
+    titles = Title.objects.filter(
+        rating__isnull=False, review_count__gte=get_min_reviews()
+    )
+    if scope == Scope.CATEGORY:
+        return titles.filter(category__slug=key)
+    if scope == Scope.GENRE:
+        return titles.filter(Exists(GenreTitle.objects.filter(
+            title=OuterRef('pk'), genre__slug=key
+        )))
+    if scope == Scope.YEAR:
+        return titles.filter(year=int(key))
+    return titles
+
+
+def make_entry(title, scope, key):
+    return LeaderboardEntry(
+        scope=scope, key=key, title_id=title.pk,
+        rating=title.rating, review_count=title.review_count,
+    )
+
+
+def rank(rating, review_count, title_id):
+    return (-rating, -review_count, title_id)
+
+
+def refill(scope, key):
+    """Добирает топ до полного размера лучшими произведениями вне его."""
+    entries = board_entries(scope, key)
+    missing = get_size() - entries.count()
+    if missing <= 0:
+        return
+    candidates = board_titles(scope, key).exclude(
+        Exists(entries.filter(title=OuterRef('pk')))
+    ).order_by('-rating', '-review_count', 'id')[:missing]
+    LeaderboardEntry.objects.bulk_create(
+        make_entry(title, scope, key) for title in candidates
+    )
+
+
+def place(title, scope, key, present):
+    entries = board_entries(scope, key)
+    size = get_size()
+    if present:
+        entries.filter(title=title).update(
+            rating=title.rating, review_count=title.review_count
+        )
+        last = entries.order_by(*RANK_ORDERING)[size - 1:size].first()
+        if last is not None and last.title_id == title.pk:
+            # вне топа может найтись произведение лучше опустившегося
+            last.delete()
+            refill(scope, key)
+        return
+    last = entries.order_by(*RANK_ORDERING)[size - 1:size].first()
+    if last is not None and rank(
+        title.rating, title.review_count, title.pk
+    ) > rank(last.rating, last.review_count, last.title_id):
+        return
+    make_entry(title, scope, key).save()
+    if last is not None:
+        last.delete()
+
+
+def update_title(title_id):
+    """Обновляет топы после изменения рейтинга, категории, жанров или года.
+
+    Вызывается в транзакции, где изменилось произведение.
+    """
+    title = Title.objects.select_related('category').filter(
+        pk=title_id
+    ).first()
+    current = (
+        get_boards(title) if title is not None and is_eligible(title) else []
+    )
+    previous = set(
+        LeaderboardEntry.objects.filter(
+            title_id=title_id
+        ).values_list('scope', 'key')
+    )
+    for scope, key in previous - set(current):
+        board_entries(scope, key).filter(title_id=title_id).delete()
+        refill(scope, key)
+    for scope, key in current:
+        place(title, scope, key, (scope, key) in previous)
+
+
+def remove_title(title):
+    """Удаляет произведение и добирает топы, в которых оно было."""
+    boards = set(title.leaderboard_entries.values_list('scope', 'key'))
+    title.delete()
+    for scope, key in boards:
+        refill(scope, key)
+
+
+def drop_board(scope, key):
+    board_entries(scope, key).delete()
+
+
+def rebuild():
+    """Пересобирает все топы по сохранённым рейтингам произведений."""
+    LeaderboardEntry.objects.all().delete()
+    boards = [(Scope.ALL, '')]
+    boards.extend(
+        (Scope.CATEGORY, slug)
+        for slug in Category.objects.values_list('slug', flat=True)
+    )
+    boards.extend(
+        (Scope.GENRE, slug)
+        for slug in Genre.objects.values_list('slug', flat=True)
+    )
+    boards.extend(
+        (Scope.YEAR, str(year))
+        for year in Title.objects.order_by().values_list(
+            'year', flat=True
+        ).distinct()
+    )
+    for scope, key in boards:
+        refill(scope, key)
+    return len(boards)
+
+
+def ranked_titles(queryset):
+    """Произведения queryset, подходящие в топ, в порядке топа.
+
+    Для фильтров, которые не совпадают ни с одной областью топа: без
+    ограничения LEADERBOARD_SIZE, но с сортировкой по таблице произведений.
+    """
+    return queryset.filter(
+        rating__isnull=False, review_count__gte=get_min_reviews()
+    ).order_by('-rating', '-review_count', 'id')
+
+
+def top_titles(queryset, scope, key):
+    """Произведения топа в порядке рейтинга."""
+    return queryset.filter(
+        leaderboard_entries__scope=scope, leaderboard_entries__key=key
+    ).order_by(
+        '-leaderboard_entries__rating',
+        '-leaderboard_entries__review_count',
+        # порядок индекса, а не reviews_title.id: иначе SQLite досортирует
+        'leaderboard_entries__title_id',
+    )
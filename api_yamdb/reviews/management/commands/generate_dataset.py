@@ -0,0 +1,68 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from reviews import dataset
+from reviews.signals import data_loaded
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими данными с распределением '
+        'популярности по закону Ципфа'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in (
+            ('users', 1000),
+            ('categories', 20),
+            ('genres', 50),
+            ('titles', 10000),
+            ('reviews', 100000),
+            ('comments', 200000),
+        ):
+            parser.add_argument(
+                f'--{name}', type=int, default=default,
+                help=f'Сколько создать (по умолчанию {default})',
+            )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Один seed на пустой базе даёт одни и те же данные',
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.1,
+            help='Показатель распределения Ципфа; 0 - равномерно',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=dataset.DEFAULT_BATCH_SIZE,
+            help='Количество строк в одном INSERT',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            with transaction.atomic():
+                created = dataset.generate(
+                    options['users'], options['titles'], options['reviews'],
+                    options['comments'], categories=options['categories'],
+                    genres=options['genres'], seed=options['seed'],
+                    skew=options['skew'], batch_size=options['batch_size'],
+                )
+        except ValueError as error:
+            raise CommandError(str(error))
+        data_loaded.send(sender=self.__class__)
+        elapsed = time.monotonic() - started
+        rows = sum(len(ids) for ids in created.values())
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(
+                f'{model._meta.verbose_name_plural}: {len(ids)}'
+                for model, ids in created.items()
+            ) + f'; {rows / elapsed if elapsed else rows:.0f} rows/s'
+        ))
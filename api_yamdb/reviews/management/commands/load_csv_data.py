@@ -1,13 +1,23 @@
 import csv
+import time
+from pathlib import Path
 
-from django.core.management import BaseCommand
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.core.management import BaseCommand, CommandError
 from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import CASCADE, SET_NULL
+from django.utils import timezone
 
+from reviews import leaderboards
+from reviews.signals import data_loaded
+from reviews.utils import batched
 from reviews.models import (Category, Genre, GenreTitle,
                             Title, Comment, Review, User)
 
-# файлы должны импортироваться в определённом порядке,
-# чтобы для полей FOREIGN KEY уже существовали значения в др. таблицах
+# порядок импорта вычисляется по FOREIGN KEY моделей,
+# см. import_order()
 MODEL_FILE_MAPPING = {
     User: 'users.csv',
     Category: 'category.csv',
@@ -17,6 +27,7 @@ MODEL_FILE_MAPPING = {
     Genre: 'genre.csv',
     GenreTitle: 'genre_title.csv'
 }
+DEFAULT_BATCH_SIZE = 1000
 
 
 def replace_wrong_fields(model, fieldnames_list):
@@ -30,21 +41,274 @@ def replace_wrong_fields(model, fieldnames_list):
     return fieldnames_list
 
 
+def get_dependencies(models):
+    """Модели из `models`, на которые ссылаются FOREIGN KEY каждой модели."""
+    return {
+        model: {
+            field.related_model
+            for field in model._meta.concrete_fields
+            if field.is_relation
+            and field.related_model in models
+            and field.related_model is not model
+        }
+        for model in models
+    }
+
+
+def import_order(models):
+    """Топологическая сортировка моделей: сначала те, на кого ссылаются."""
+    dependencies = get_dependencies(models)
+    order = []
+    while dependencies:
+        ready = [
+            model for model, required in dependencies.items()
+            if not required - set(order)
+        ]
+        if not ready:
+            raise CommandError(
+                'Циклическая зависимость между моделями: '
+                + ', '.join(model.__name__ for model in dependencies)
+            )
+        for model in ready:
+            order.append(model)
+            del dependencies[model]
+    return order
+
+
+def referencing_fields(model):
+    """Внешние ключи всех моделей, включая таблицы ManyToMany, на model."""
+    for other in apps.get_models(include_auto_created=True):
+        for field in other._meta.concrete_fields:
+            if field.is_relation and field.related_model is model:
+                yield other, field
+
+
+def delete_rows(model, where, params=()):
+    """Удаляет строки model по условию SQL без чтения их в память.
+
+    QuerySet.delete() собирает каскад через Collector и читает каждую
+    связанную строку. Здесь ссылающиеся строки удаляются или обнуляются
+    подзапросом по тому же условию, как требует их on_delete, а затем
+    удаляются сами строки.
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    with connection.cursor() as cursor:
+        for other, field in referencing_fields(model):
+            condition = (
+                f'{quote(field.column)} IN (SELECT '
+                f'{quote(field.target_field.column)} FROM {table} '
+                f'WHERE {where})'
+            )
+            if field.remote_field.on_delete is CASCADE:
+                delete_rows(other, condition, params)
+            elif field.remote_field.on_delete is SET_NULL:
+                cursor.execute(
+                    f'UPDATE {quote(other._meta.db_table)} '
+                    f'SET {quote(field.column)} = NULL WHERE {condition}',
+                    params,
+                )
+        cursor.execute(f'DELETE FROM {table} WHERE {where}', params)
+
+
+def clear_tables(order):
+    """Очищает таблицы моделей, не загружая их строки в память.
+
+    Таблицы очищаются в порядке, обратном порядку импорта, через
+    delete_rows(): ссылки из других моделей (топы, связи ManyToMany,
+    журнал админки) удаляются или обнуляются, как требует их on_delete.
+    """
+    for model in reversed(order):
+        delete_rows(model, '1 = 1')
+
+
+def read_rows(model, file_path):
+    """Лениво читает CSV и отдаёт проверенные словари значений полей."""
+    with open(file_path, newline='', encoding='utf-8') as file:
+        data = csv.DictReader(file)
+        data.fieldnames = replace_wrong_fields(model, data.fieldnames)
+        fields = [model._meta.get_field(name) for name in data.fieldnames]
+        for line, row in enumerate(data, 2):
+            values = {}
+            for field in fields:
+                value = row[field.attname]
+                if value == '' and field.null:
+                    value = None
+                try:
+                    values[field.attname] = field.to_python(value)
+                except ValidationError as error:
+                    raise CommandError(
+                        f'{file_path.name}, строка {line}, поле '
+                        f'{field.attname}: {"; ".join(error.messages)}'
+                    )
+            yield values
+
+
+def upsert_batch(model, batch):
+    """Вставляет новые строки и обновляет изменившиеся.
+
+    Возвращает число созданных и обновлённых объектов.
+    """
+    pk_name = model._meta.pk.attname
+    existing = model.objects.in_bulk([row[pk_name] for row in batch])
+    # auto_now_add при вставке не берётся из CSV, поэтому не сравнивается;
+    # auto_now обновляется вручную - bulk_update не вызывает pre_save
+    skipped = {
+        field.attname for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    }
+    touched = [
+        field.attname for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+    ]
+    created, changed, update_fields = [], [], set()
+    now = timezone.now()
+    for row in batch:
+        obj = existing.get(row[pk_name])
+        if obj is None:
+            created.append(model(**row))
+            continue
+        diff = {
+            name: value for name, value in row.items()
+            if name not in skipped and getattr(obj, name) != value
+        }
+        if not diff:
+            continue
+        for name, value in diff.items():
+            setattr(obj, name, value)
+        for name in touched:
+            setattr(obj, name, now)
+        update_fields.update(diff, touched)
+        changed.append(obj)
+    model.objects.bulk_create(created)
+    if changed:
+        model.objects.bulk_update(changed, update_fields)
+    return len(created), len(changed)
+
+
+def create_staging(model):
+    """Создаёт временную таблицу для первичных ключей строк из CSV."""
+    staging = connection.ops.quote_name(f'staging_{model._meta.db_table}')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {staging} '
+            f'(pk {model._meta.pk.rel_db_type(connection)} PRIMARY KEY)'
+        )
+    return staging
+
+
+def stage_keys(staging, keys):
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {staging} (pk) VALUES (%s)',
+            [(key,) for key in keys],
+        )
+
+
+def delete_missing(model, staging, batch_size):
+    """Удаляет строки model, ключей которых нет во временной таблице.
+
+    Ключи для удаления собираются антиджойном до первого DELETE,
+    а удаляются пачками; временная таблица удаляется в конце.
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    pk = quote(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {pk} FROM {table} WHERE NOT EXISTS '
+            f'(SELECT 1 FROM {staging} WHERE {staging}.pk = {table}.{pk})'
+        )
+        missing = [key for key, in cursor.fetchall()]
+        for batch in batched(missing, batch_size):
+            placeholders = ', '.join(['%s'] * len(batch))
+            delete_rows(model, f'{pk} IN ({placeholders})', batch)
+        cursor.execute(f'DROP TABLE {staging}')
+    return len(missing)
+
+
 class Command(BaseCommand):
+    help = 'Загружает данные из CSV в базу данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            type=Path,
+            default=Path(settings.BASE_DIR) / 'static' / 'data',
+            help='Каталог с CSV-файлами',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Количество строк в одном INSERT',
+        )
+        parser.add_argument(
+            '--upsert',
+            action='store_true',
+            help='Не очищать таблицы: добавить новые и обновить '
+                 'изменившиеся строки',
+        )
+        parser.add_argument(
+            '--delete-missing',
+            action='store_true',
+            help='С --upsert удалить строки, которых нет в CSV',
+        )
 
     def handle(self, *args, **options):
-        folder_path = str(settings.BASE_DIR) + '\\static\\data\\'
-        for model, file_name in MODEL_FILE_MAPPING.items():
-            file_path = folder_path + file_name
-            with open(file_path,
-                      newline='',
-                      encoding='utf-8') as file:
-                data = csv.DictReader(file)
-                data.fieldnames = replace_wrong_fields(model, data.fieldnames)
-                values = [
-                    model(**row)
-                    for row in data
-                ]
-                model.objects.all().delete()
-                model.objects.bulk_create(values)
-                self.stdout.write(self.style.SUCCESS(f'{file_name} is loaded'))
+        if options['delete_missing'] and not options['upsert']:
+            raise CommandError('--delete-missing работает только с --upsert')
+        self.upsert = options['upsert']
+        self.delete_missing = options['delete_missing']
+        self.batch_size = batch_size = options['batch_size']
+        folder_path = options['path']
+        order = import_order(list(MODEL_FILE_MAPPING))
+        try:
+            if not self.upsert:
+                with transaction.atomic():
+                    clear_tables(order)
+            for model in order:
+                rows = read_rows(
+                    model, folder_path / MODEL_FILE_MAPPING[model]
+                )
+                self.write_file(model, batched(rows, batch_size))
+            # bulk_create не проходит через ReviewViewSet, поэтому
+            # денормализованный рейтинг и топы пересчитываются целиком
+            with transaction.atomic():
+                Title.objects.rebuild_ratings()
+                leaderboards.rebuild()
+        finally:
+            # очистка и каждый файл фиксируются отдельно, а сигналы
+            # моделей при этом не срабатывают: кеши, версии пользователей
+            # и индекс подсказок сбрасываются и после ошибки загрузки
+            data_loaded.send(sender=self.__class__)
+
+    def write_file(self, model, batches):
+        started = time.monotonic()
+        rows = created = updated = deleted = 0
+        with transaction.atomic():
+            if self.delete_missing:
+                # ключи из CSV копятся во временной таблице, а не в памяти
+                staging = create_staging(model)
+            for batch in batches:
+                rows += len(batch)
+                if not self.upsert:
+                    model.objects.bulk_create(model(**row) for row in batch)
+                    continue
+                batch_created, batch_updated = upsert_batch(model, batch)
+                created += batch_created
+                updated += batch_updated
+                if self.delete_missing:
+                    pk_name = model._meta.pk.attname
+                    stage_keys(staging, (row[pk_name] for row in batch))
+            if self.delete_missing:
+                deleted = delete_missing(model, staging, self.batch_size)
+        elapsed = time.monotonic() - started
+        changes = (
+            f' ({created} created, {updated} updated, {deleted} deleted)'
+            if self.upsert else ''
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{MODEL_FILE_MAPPING[model]} is loaded: {rows} rows{changes}, '
+            f'{rows / elapsed if elapsed else rows:.0f} rows/s'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+
+from reviews import search
+
+
+class Command(BaseCommand):
+    help = 'Восстанавливает полнотекстовый индекс произведений'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            search.uninstall(connection)
+            search.install(connection)
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен'))
@@ -0,0 +1,56 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Avg, Count, Sum
+
+from reviews import leaderboards
+from reviews.models import Title
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рейтинг, число отзывов и сумму оценок '
+            'произведений и пересобирает топы')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить сохранённые значения, ничего не меняя',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            self.check_ratings()
+            return
+        with transaction.atomic():
+            updated = Title.objects.rebuild_ratings()
+            boards = leaderboards.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано: {updated}, топов: {boards}'
+        ))
+
+    def check_ratings(self):
+        actual = Title.objects.annotate(
+            actual_count=Count('review'),
+            actual_sum=Sum('review__score'),
+            actual_rating=Avg('review__score'),
+        ).values_list(
+            'pk', 'review_count', 'score_sum', 'rating',
+            'actual_count', 'actual_sum', 'actual_rating',
+        )
+        broken = 0
+        for (pk, count, total, rating,
+             actual_count, actual_sum, actual_rating) in actual.iterator():
+            if (count, total) == (actual_count, actual_sum or 0) and (
+                rating == actual_rating
+                or None not in (rating, actual_rating)
+                and abs(rating - actual_rating) < 1e-9
+            ):
+                continue
+            broken += 1
+            self.stdout.write(
+                f'title {pk}: {count}/{total}/{rating}, '
+                f'ожидалось {actual_count}/{actual_sum or 0}/{actual_rating}'
+            )
+        if broken:
+            raise CommandError(f'Рассогласованных произведений: {broken}')
+        self.stdout.write(self.style.SUCCESS('Рейтинги согласованы'))
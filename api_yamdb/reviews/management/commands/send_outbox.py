@@ -0,0 +1,56 @@
+import time
+
+from django.core.management import BaseCommand
+
+from reviews import outbox
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди исходящих писем'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Писем на одно SMTP-соединение',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Потоков, каждый отправляет свою пачку',
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=outbox.get_max_attempts(),
+            help='После стольких неудач письмо помечается как failed',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Не завершаться, а ждать новых писем',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Пауза в секундах между проверками очереди с --loop',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            claimed, sent = outbox.send_due(
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                max_attempts=options['max_attempts'],
+            )
+            if claimed:
+                self.stdout.write(
+                    f'Отправлено: {sent}, отложено: {claimed - sent}'
+                )
+            if not options['loop']:
+                break
+            if not claimed:
+                time.sleep(options['interval'])
@@ -0,0 +1,36 @@
+# Generated by Django 3.2 on 2026-10-18 19:28
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_pub_dates(apps, schema_editor):
+    for model_name in ('Review', 'Comment'):
+        model = apps.get_model('reviews', model_name)
+        model.objects.update(updated=F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_title_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(copy_pub_dates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.2 on 2026-10-18 19:33
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_genre_titles(apps, schema_editor):
+    GenreTitle = apps.get_model('reviews', 'GenreTitle')
+    duplicates = GenreTitle.objects.order_by().values(
+        'title', 'genre'
+    ).annotate(first=Min('id'), count=Count('id')).filter(count__gt=1)
+    for row in duplicates:
+        GenreTitle.objects.filter(
+            title=row['title'], genre=row['genre']
+        ).exclude(pk=row['first']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_modification_dates'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_genre_titles, migrations.RunPython.noop
+        ),
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ('pub_date', 'id'), 'verbose_name': 'комментарий', 'verbose_name_plural': 'Комментарии'},
+        ),
+        migrations.AlterModelOptions(
+            name='review',
+            options={'ordering': ('pub_date', 'id'), 'verbose_name': 'отзыв', 'verbose_name_plural': 'Отзывы'},
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['review', 'pub_date', 'id'], name='comment_review_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='genretitle',
+            index=models.Index(fields=['genre', 'title'], name='genre_title_genre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['title', 'pub_date', 'id'], name='review_title_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['year'], name='title_year_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='genretitle',
+            constraint=models.UniqueConstraint(fields=('title', 'genre'), name='unique_genre_title'),
+        ),
+    ]
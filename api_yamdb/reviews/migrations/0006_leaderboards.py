@@ -0,0 +1,37 @@
+# Generated by Django 3.2 on 2026-10-18 19:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_title_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('all', 'All'), ('category', 'Category'), ('genre', 'Genre'), ('year', 'Year')], max_length=16, verbose_name='Область')),
+                ('key', models.CharField(blank=True, help_text='Пусто для топа всех произведений', max_length=50, verbose_name='Слаг или год')),
+                ('rating', models.FloatField(verbose_name='Рейтинг')),
+                ('review_count', models.PositiveIntegerField(verbose_name='Количество отзывов')),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='reviews.title', verbose_name='Произведение')),
+            ],
+            options={
+                'verbose_name': 'позиция в топе',
+                'verbose_name_plural': 'Топы произведений',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['scope', 'key', '-rating', '-review_count', 'title'], name='leaderboard_rank_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardentry',
+            constraint=models.UniqueConstraint(fields=('scope', 'key', 'title'), name='unique_leaderboard_title'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2 on 2026-10-18 20:42
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='comment',
+            name='updated',
+        ),
+        migrations.RemoveField(
+            model_name='review',
+            name='updated',
+        ),
+        migrations.RemoveField(
+            model_name='title',
+            name='updated',
+        ),
+    ]
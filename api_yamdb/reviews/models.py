@@ -1,6 +1,10 @@
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import (Avg, Case, Count, F, FloatField, OuterRef,
+                              Subquery, Sum, Value, When)
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -56,6 +60,46 @@ class Genre(models.Model):
         return self.name
 
 
+class TitleQuerySet(models.QuerySet):
+    def with_relations(self):
+        """Подгружает категорию и жанры для вложенных сериализаторов."""
+        return self.select_related('category').prefetch_related('genre')
+
+    def shift_rating(self, count_delta, score_delta):
+        """Сдвигает счётчики отзывов и пересчитывает рейтинг одним UPDATE."""
+        review_count = F('review_count') + count_delta
+        score_sum = F('score_sum') + score_delta
+        return self.update(
+            review_count=review_count,
+            score_sum=score_sum,
+            rating=Case(
+                When(review_count=-count_delta, then=Value(None)),
+                default=Cast(score_sum, FloatField()) / review_count,
+                output_field=FloatField(),
+            ),
+        )
+
+    def rebuild_ratings(self):
+        """Пересчитывает рейтинг и счётчики по таблице отзывов."""
+        reviews = Review.objects.filter(
+            title=OuterRef('pk')
+        ).order_by().values('title')
+        return self.update(
+            review_count=Coalesce(
+                Subquery(reviews.annotate(value=Count('id')).values('value')),
+                0
+            ),
+            score_sum=Coalesce(
+                Subquery(reviews.annotate(value=Sum('score')).values('value')),
+                0
+            ),
+            rating=Subquery(
+                reviews.annotate(value=Avg('score')).values('value'),
+                output_field=FloatField()
+            ),
+        )
+
+
 class Title(models.Model):
     name = models.CharField('Название', max_length=255)
     year = models.PositiveSmallIntegerField('Год выхода')
@@ -67,9 +111,19 @@ class Title(models.Model):
     genre = models.ManyToManyField(
         Genre, through='GenreTitle',
         verbose_name='Жанр')
+    rating = models.FloatField('Рейтинг', null=True, blank=True)
+    review_count = models.PositiveIntegerField(
+        'Количество отзывов', default=0
+    )
+    score_sum = models.PositiveIntegerField('Сумма оценок', default=0)
+
+    objects = TitleQuerySet.as_manager()
 
     class Meta:
         ordering = ('name',)
+        indexes = (
+            models.Index(fields=('year',), name='title_year_idx'),
+        )
         verbose_name = 'произведение'
         verbose_name_plural = 'Произведения'
 
@@ -97,8 +151,14 @@ class Review(models.Model):
     )
 
     class Meta:
-        ordering = ('pub_date',)
+        ordering = ('pub_date', 'id')
         unique_together = [['author', 'title']]
+        indexes = (
+            models.Index(
+                fields=('title', 'pub_date', 'id'),
+                name='review_title_pub_date_idx'
+            ),
+        )
         verbose_name = 'отзыв'
         verbose_name_plural = 'Отзывы'
 
@@ -115,7 +175,13 @@ class Comment(models.Model):
     )
 
     class Meta:
-        ordering = ('pub_date',)
+        ordering = ('pub_date', 'id')
+        indexes = (
+            models.Index(
+                fields=('review', 'pub_date', 'id'),
+                name='comment_review_pub_date_idx'
+            ),
+        )
         verbose_name = 'комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -123,3 +189,102 @@ class Comment(models.Model):
 class GenreTitle(models.Model):
     title = models.ForeignKey(Title, on_delete=models.CASCADE)
     genre = models.ForeignKey(Genre, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('title', 'genre'), name='unique_genre_title'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('genre', 'title'), name='genre_title_genre_idx'
+            ),
+        )
+
+
+class LeaderboardEntry(models.Model):
+    """Позиция произведения в материализованном топе.
+
+    Топ хранит не больше LEADERBOARD_SIZE лучших произведений области:
+    всех произведений, категории, жанра или года. Поддерживается
+    функциями из reviews.leaderboards.
+    """
+
+    class Scope(models.TextChoices):
+        ALL = 'all'
+        CATEGORY = 'category'
+        GENRE = 'genre'
+        YEAR = 'year'
+
+    scope = models.CharField('Область', max_length=16, choices=Scope.choices)
+    key = models.CharField(
+        'Слаг или год', max_length=50, blank=True,
+        help_text='Пусто для топа всех произведений'
+    )
+    title = models.ForeignKey(
+        Title, on_delete=models.CASCADE,
+        related_name='leaderboard_entries', verbose_name='Произведение'
+    )
+    rating = models.FloatField('Рейтинг')
+    review_count = models.PositiveIntegerField('Количество отзывов')
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('scope', 'key', 'title'),
+                name='unique_leaderboard_title'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('scope', 'key', '-rating', '-review_count', 'title'),
+                name='leaderboard_rank_idx'
+            ),
+        )
+        verbose_name = 'позиция в топе'
+        verbose_name_plural = 'Топы произведений'
+
+
+class OutgoingEmail(models.Model):
+    """Письмо в очереди на отправку, см. reviews.outbox."""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending'
+        SENT = 'sent'
+        FAILED = 'failed'
+
+    subject = models.CharField('Тема', max_length=255)
+    body = models.TextField('Текст')
+    from_email = models.CharField('Отправитель', max_length=254)
+    recipients = models.TextField(
+        'Получатели', help_text='Адреса через запятую'
+    )
+    status = models.CharField(
+        'Статус', max_length=16,
+        choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    next_attempt = models.DateTimeField(
+        'Следующая попытка', default=timezone.now
+    )
+    claim = models.CharField(
+        'Метка обработчика', max_length=32, blank=True,
+        help_text='Какой запуск send_outbox отправляет письмо'
+    )
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Дата создания', auto_now_add=True)
+    sent = models.DateTimeField('Дата отправки', null=True, blank=True)
+
+    class Meta:
+        ordering = ('id',)
+        indexes = (
+            models.Index(
+                fields=('status', 'next_attempt'), name='outbox_due_idx'
+            ),
+        )
+        verbose_name = 'исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+
+    def __str__(self):
+        return f'{self.subject} -> {self.recipients}'
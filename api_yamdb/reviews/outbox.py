@@ -0,0 +1,145 @@
+"""Очередь исходящих писем.
+
+Представления только сохраняют письмо (`enqueue`), отправляет их команда
+`send_outbox`: забирает пачки готовых к отправке писем, отправляет каждую
+пачку через одно SMTP-соединение в своём потоке и откладывает неудачные
+письма с экспоненциальной задержкой. С EMAIL_OUTBOX_EAGER письмо
+отправляется сразу после коммита транзакции, в которой его поставили.
+"""
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connections, transaction
+from django.utils import timezone
+
+from reviews.models import OutgoingEmail
+
+Status = OutgoingEmail.Status
+# забранное письмо другие запуски не трогают, пока не истечёт аренда
+LEASE = timedelta(minutes=10)
+RETRY_DELAY = timedelta(minutes=1)
+MAX_RETRY_DELAY = timedelta(hours=1)
+
+
+def get_max_attempts():
+    return getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+
+
+def enqueue(subject, message, from_email, recipient_list):
+    """Ставит письмо в очередь вместо send_mail."""
+    eager = getattr(settings, 'EMAIL_OUTBOX_EAGER', False)
+    email = OutgoingEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email,
+        recipients=','.join(recipient_list),
+        next_attempt=timezone.now() + (LEASE if eager else timedelta()),
+    )
+    if eager:
+        transaction.on_commit(lambda: send_batch([email]))
+    return email
+
+
+def retry_delay(attempts):
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def claim(limit):
+    """Забирает до `limit` писем, срок отправки которых наступил."""
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = OutgoingEmail.objects.filter(
+        status=Status.PENDING, next_attempt__lte=now
+    )
+    ids = list(due.order_by('next_attempt', 'id').values_list(
+        'pk', flat=True
+    )[:limit])
+    # повторная проверка срока в UPDATE не даёт двум запускам
+    # забрать одно письмо
+    due.filter(pk__in=ids).update(claim=token, next_attempt=now + LEASE)
+    return list(OutgoingEmail.objects.filter(claim=token))
+
+
+def retry_later(email, error, max_attempts):
+    email.attempts += 1
+    email.last_error = str(error)
+    email.claim = ''
+    if email.attempts >= max_attempts:
+        email.status = Status.FAILED
+    else:
+        email.next_attempt = timezone.now() + retry_delay(email.attempts)
+    email.save(update_fields=(
+        'attempts', 'last_error', 'claim', 'status', 'next_attempt'
+    ))
+
+
+def send_batch(emails, max_attempts=None):
+    """Отправляет письма через одно соединение, возвращает число отправленных.
+
+    Неотправленные письма откладываются или, после `max_attempts`
+    попыток, помечаются как failed.
+    """
+    if max_attempts is None:
+        max_attempts = get_max_attempts()
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        for email in emails:
+            retry_later(email, error, max_attempts)
+        return 0
+    delivered = []
+    try:
+        for email in emails:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=email.recipients.split(','),
+                connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as error:
+                retry_later(email, error, max_attempts)
+            else:
+                delivered.append(email.pk)
+    finally:
+        connection.close()
+        OutgoingEmail.objects.filter(pk__in=delivered).update(
+            status=Status.SENT, sent=timezone.now(), claim=''
+        )
+    return len(delivered)
+
+
+def send_batch_in_thread(emails, max_attempts):
+    try:
+        return send_batch(emails, max_attempts)
+    finally:
+        # у каждого потока своё соединение с БД
+        connections.close_all()
+
+
+def send_due(batch_size=100, workers=1, max_attempts=None):
+    """Отправляет до `workers` пачек писем.
+
+    Возвращает число забранных и отправленных писем.
+    """
+    batches = []
+    for _ in range(workers):
+        batch = claim(batch_size)
+        if not batch:
+            break
+        batches.append(batch)
+    claimed = sum(len(batch) for batch in batches)
+    if len(batches) <= 1:
+        sent = sum(send_batch(batch, max_attempts) for batch in batches)
+        return claimed, sent
+    with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+        sent = sum(pool.map(
+            send_batch_in_thread, batches, [max_attempts] * len(batches)
+        ))
+    return claimed, sent
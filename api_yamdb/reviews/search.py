@@ -0,0 +1,170 @@
+"""Полнотекстовый поиск по названию и описанию произведений.
+
+SQLite: внешняя FTS5-таблица `reviews_title_fts` над `reviews_title`,
+синхронизируется триггерами на INSERT/UPDATE/DELETE, поэтому в индекс
+попадают и записи через bulk_create/update. PostgreSQL: GIN-индекс по
+to_tsvector, запросы используют то же выражение. На остальных СУБД
+поиск сводится к icontains без ранжирования.
+
+Пересоздание таблицы `reviews_title` схемой SQLite (AlterField и т.п.)
+удаляет триггеры; обработчик post_migrate `restore` ставит их заново
+после каждого `migrate`. `manage.py rebuild_search_index` перестраивает
+индекс вручную.
+"""
+import re
+
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'reviews_title_fts'
+# миграция, которая создаёт индекс; до неё индекса быть не должно
+INSTALL_MIGRATION = ('reviews', '0005_title_search')
+# название весит больше описания
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+PG_DOCUMENT = (
+    "to_tsvector('simple', coalesce(reviews_title.name, '') || ' ' || "
+    "coalesce(reviews_title.description, ''))"
+)
+
+SQLITE_INSTALL = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description,
+        content='reviews_title', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+    AFTER INSERT ON reviews_title BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+    AFTER DELETE ON reviews_title BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF name, description ON reviews_title BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+)
+SQLITE_OBJECTS = (
+    FTS_TABLE, f'{FTS_TABLE}_insert', f'{FTS_TABLE}_delete',
+    f'{FTS_TABLE}_update',
+)
+SQLITE_UNINSTALL = (
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+POSTGRESQL_INSTALL = (
+    f'CREATE INDEX IF NOT EXISTS reviews_title_search_idx '
+    f'ON reviews_title USING gin ({PG_DOCUMENT})',
+)
+POSTGRESQL_UNINSTALL = (
+    'DROP INDEX IF EXISTS reviews_title_search_idx',
+)
+
+
+def execute_all(connection, statements):
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def install(connection):
+    """Создаёт (или восстанавливает) поисковый индекс и наполняет его."""
+    if connection.vendor == 'sqlite':
+        execute_all(connection, SQLITE_INSTALL)
+    elif connection.vendor == 'postgresql':
+        execute_all(connection, POSTGRESQL_INSTALL)
+
+
+def uninstall(connection):
+    if connection.vendor == 'sqlite':
+        execute_all(connection, SQLITE_UNINSTALL)
+    elif connection.vendor == 'postgresql':
+        execute_all(connection, POSTGRESQL_UNINSTALL)
+
+
+def is_installed(connection):
+    if connection.vendor != 'sqlite':
+        # индекс PostgreSQL переживает изменения таблицы
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT COUNT(*) FROM sqlite_master WHERE name IN '
+            f'({", ".join(["%s"] * len(SQLITE_OBJECTS))})',
+            SQLITE_OBJECTS,
+        )
+        return cursor.fetchone()[0] == len(SQLITE_OBJECTS)
+
+
+def restore(using, **kwargs):
+    """post_migrate: восстанавливает индекс, удалённый миграцией."""
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+    if INSTALL_MIGRATION in applied and not is_installed(connection):
+        install(connection)
+
+
+def get_terms(query):
+    return re.findall(r'\w+', query)
+
+
+def search_titles(queryset, query, ranked=True):
+    """Отбирает произведения по запросу; `ranked` - по релевантности."""
+    terms = get_terms(query)
+    if not terms:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        # каждое слово - префиксный поиск, слова объединяются через AND
+        match = ' '.join(f'"{term}"*' for term in terms)
+        # FTS-таблица присоединяется по rowid: MATCH выполняется один раз
+        # на запрос, а bm25 считается для найденных строк
+        found = queryset.extra(
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE}.rowid = reviews_title.id',
+                f'{FTS_TABLE} MATCH %s',
+            ],
+            params=[match],
+        )
+        if not ranked:
+            return found
+        return found.extra(select={'search_rank': (
+            f'bm25({FTS_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT})'
+        )}).order_by('search_rank', 'id')
+    if vendor == 'postgresql':
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        found = queryset.filter(RawSQL(
+            f"{PG_DOCUMENT} @@ to_tsquery('simple', %s)",
+            (tsquery,), output_field=BooleanField()
+        ))
+        if not ranked:
+            return found
+        return found.annotate(search_rank=RawSQL(
+            f"-ts_rank({PG_DOCUMENT}, to_tsquery('simple', %s))",
+            (tsquery,)
+        )).order_by('search_rank', 'id')
+    condition = Q()
+    for term in terms:
+        condition &= Q(name__icontains=term) | Q(description__icontains=term)
+    found = queryset.filter(condition)
+    return found.order_by('id') if ranked else found
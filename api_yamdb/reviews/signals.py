@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# отправляют команды, которые пишут в базу пачками в обход моделей
+# и API: обработчики сбрасывают кеши, построенные по прежним данным
+data_loaded = Signal()
@@ -0,0 +1,79 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from tests.utils import create_reviews, create_single_review
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08RatingAPI:
+
+    TITLE_DETAIL_URL_TEMPLATE = '/api/v1/titles/{title_id}/'
+    REVIEW_DETAIL_URL_TEMPLATE = (
+        '/api/v1/titles/{title_id}/reviews/{review_id}/'
+    )
+
+    def get_rating(self, client, title_id):
+        response = client.get(
+            self.TITLE_DETAIL_URL_TEMPLATE.format(title_id=title_id)
+        )
+        return response.json().get('rating')
+
+    def test_01_rating_follows_review_writes(self, client, admin_client,
+                                             admin, user_client, user,
+                                             moderator_client, moderator):
+        author_map = {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client
+        }
+        reviews, titles = create_reviews(admin_client, author_map)
+        title_id = titles[0]['id']
+        assert self.get_rating(client, title_id) == 5, (
+            'Рейтинг произведения должен обновляться при создании отзыва.'
+        )
+
+        user_client.patch(
+            self.REVIEW_DETAIL_URL_TEMPLATE.format(
+                title_id=title_id, review_id=reviews[1]['id']
+            ),
+            data={'score': 8}
+        )
+        assert self.get_rating(client, title_id) == 6, (
+            'Рейтинг произведения должен обновляться при изменении оценки.'
+        )
+
+        moderator_client.delete(
+            self.REVIEW_DETAIL_URL_TEMPLATE.format(
+                title_id=title_id, review_id=reviews[0]['id']
+            )
+        )
+        assert self.get_rating(client, title_id) == 6.5, (
+            'Рейтинг произведения должен обновляться при удалении отзыва.'
+        )
+
+        for review in reviews[1:]:
+            admin_client.delete(
+                self.REVIEW_DETAIL_URL_TEMPLATE.format(
+                    title_id=title_id, review_id=review['id']
+                )
+            )
+        assert self.get_rating(client, title_id) is None, (
+            'Если отзывов о произведении не осталось - значением поля '
+            '`rating` должно быть `None`.'
+        )
+        call_command('recalculate_ratings', check=True, stdout=StringIO())
+
+    def test_02_rating_after_author_deleted(self, client, admin_client,
+                                            user_client, user):
+        reviews, titles = create_reviews(admin_client, {user: user_client})
+        title_id = titles[0]['id']
+        create_single_review(admin_client, title_id, 'admin review', 9)
+
+        admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert self.get_rating(client, title_id) == 9, (
+            'Рейтинг произведения должен пересчитываться, когда отзывы '
+            'удаляются вместе с автором.'
+        )
+        call_command('recalculate_ratings', check=True, stdout=StringIO())
@@ -0,0 +1,251 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Comment, Genre, Review, Title
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200, (
+        f'Проверьте, что GET-запрос к `{url}` возвращает ответ со статусом 200.'
+    )
+    return len(context.captured_queries)
+
+
+def explain_query(client, url, table):
+    """План выполнения запроса к `table`, который выполнил эндпоинт."""
+    with CaptureQueriesContext(connection) as context:
+        client.get(url)
+    queries = [
+        query['sql'] for query in context.captured_queries
+        if f'FROM "{table}"' in query['sql'] and 'LIMIT' in query['sql']
+    ]
+    assert queries, f'GET-запрос к `{url}` не выбрал данные из `{table}`.'
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {queries[-1]}')
+        return ' '.join(str(row[-1]) for row in cursor.fetchall())
+
+
+def create_titles_with_genres(count, genres_per_title=3):
+    category = Category.objects.create(name='Фильм', slug='films')
+    genres = [
+        Genre.objects.create(name=f'Жанр {idx}', slug=f'genre-{idx}')
+        for idx in range(genres_per_title)
+    ]
+    titles = []
+    for idx in range(count):
+        title = Title.objects.create(
+            name=f'Произведение {idx}', year=2000, category=category
+        )
+        title.genre.set(genres)
+        titles.append(title)
+    return titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09QueryCount:
+
+    TITLES_URL = '/api/v1/titles/'
+    REVIEWS_URL_TEMPLATE = '/api/v1/titles/{title_id}/reviews/'
+    COMMENTS_URL_TEMPLATE = (
+        '/api/v1/titles/{title_id}/reviews/{review_id}/comments/'
+    )
+
+    def test_01_titles_list_query_count(self, client, settings):
+        settings.RESPONSE_CACHE_ALIAS = None
+        create_titles_with_genres(1)
+        single_title = count_queries(client, self.TITLES_URL)
+
+        for idx in range(10):
+            title = Title.objects.create(name=f'Ещё {idx}', year=2001)
+            title.genre.set(Genre.objects.all())
+        full_page = count_queries(client, self.TITLES_URL)
+        filtered_page = count_queries(
+            client, f'{self.TITLES_URL}?genre=genre-0&year=2001'
+        )
+
+        assert single_title == full_page == filtered_page, (
+            f'Количество запросов к БД при GET-запросе к `{self.TITLES_URL}` '
+            'не должно зависеть от числа произведений на странице.'
+        )
+
+    def test_02_reviews_and_comments_query_count(self, client,
+                                                  django_user_model):
+        title = create_titles_with_genres(1)[0]
+        authors = [
+            django_user_model.objects.create_user(
+                username=f'author{idx}', email=f'author{idx}@yamdb.fake'
+            )
+            for idx in range(6)
+        ]
+        review = Review.objects.create(
+            title=title, author=authors[0], text='text', score=5
+        )
+        Comment.objects.create(review=review, author=authors[0], text='text')
+        reviews_url = self.REVIEWS_URL_TEMPLATE.format(title_id=title.id)
+        comments_url = self.COMMENTS_URL_TEMPLATE.format(
+            title_id=title.id, review_id=review.id
+        )
+        single_review = count_queries(client, reviews_url)
+        single_comment = count_queries(client, comments_url)
+
+        for author in authors[1:]:
+            Review.objects.create(
+                title=title, author=author, text='text', score=5
+            )
+            Comment.objects.create(review=review, author=author, text='text')
+
+        assert count_queries(client, reviews_url) == single_review, (
+            f'Количество запросов к БД при GET-запросе к '
+            f'`{self.REVIEWS_URL_TEMPLATE}` не должно зависеть от числа '
+            'авторов отзывов на странице.'
+        )
+        assert count_queries(client, comments_url) == single_comment, (
+            f'Количество запросов к БД при GET-запросе к '
+            f'`{self.COMMENTS_URL_TEMPLATE}` не должно зависеть от числа '
+            'авторов комментариев на странице.'
+        )
+
+    def test_03_nested_lists_check_parent(self, client, django_user_model):
+        first, second = create_titles_with_genres(2)
+        author = django_user_model.objects.create_user(
+            username='author', email='author@yamdb.fake'
+        )
+        review = Review.objects.create(
+            title=first, author=author, text='text', score=5
+        )
+        Comment.objects.create(review=review, author=author, text='text')
+
+        response = client.get(
+            self.REVIEWS_URL_TEMPLATE.format(title_id=second.id)
+        )
+        assert response.status_code == 200, (
+            f'GET-запрос к `{self.REVIEWS_URL_TEMPLATE}` для существующего '
+            'произведения без отзывов должен возвращать ответ со статусом 200.'
+        )
+        response = client.get(
+            self.REVIEWS_URL_TEMPLATE.format(title_id=second.id + 100)
+        )
+        assert response.status_code == 404, (
+            f'GET-запрос к `{self.REVIEWS_URL_TEMPLATE}` для '
+            'несуществующего произведения должен возвращать ответ со '
+            'статусом 404.'
+        )
+        response = client.get(self.COMMENTS_URL_TEMPLATE.format(
+            title_id=second.id, review_id=review.id
+        ))
+        assert response.status_code == 404, (
+            f'GET-запрос к `{self.COMMENTS_URL_TEMPLATE}` должен возвращать '
+            'ответ со статусом 404, если отзыв относится к другому '
+            'произведению.'
+        )
+
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=first.id)
+        with CaptureQueriesContext(connection) as context:
+            client.get(url)
+        assert not any(
+            'FROM "reviews_title"' in query['sql']
+            for query in context.captured_queries
+        ), (
+            f'GET-запрос к `{self.REVIEWS_URL_TEMPLATE}` не должен отдельно '
+            'выбирать произведение, если у него есть отзывы.'
+        )
+
+    def test_04_hot_queries_use_indexes(self, client, django_user_model,
+                                        settings):
+        settings.RESPONSE_CACHE_ALIAS = None
+        title = create_titles_with_genres(2)[0]
+        author = django_user_model.objects.create_user(
+            username='author', email='author@yamdb.fake'
+        )
+        review = Review.objects.create(
+            title=title, author=author, text='text', score=5
+        )
+        Comment.objects.create(review=review, author=author, text='text')
+
+        cases = (
+            (self.REVIEWS_URL_TEMPLATE.format(title_id=title.id),
+             'reviews_review', 'review_title_pub_date_idx'),
+            (self.COMMENTS_URL_TEMPLATE.format(
+                title_id=title.id, review_id=review.id
+            ), 'reviews_comment', 'comment_review_pub_date_idx'),
+            (f'{self.TITLES_URL}?year=2000', 'reviews_title',
+             'title_year_idx'),
+        )
+        for url, table, index in cases:
+            plan = explain_query(client, url, table)
+            assert index in plan, (
+                f'Запрос GET `{url}` должен использовать индекс `{index}`. '
+                f'План: {plan}'
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'EXPLAIN QUERY PLAN SELECT title_id FROM reviews_genretitle '
+                'WHERE genre_id = %s', (1,)
+            )
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        assert 'genre_title_genre_idx' in plan, (
+            'Выборка произведений по жанру должна использовать индекс '
+            f'`genre_title_genre_idx`. План: {plan}'
+        )
+
+    def test_05_moderation_query_count(self, moderator_client, moderator,
+                                       django_user_model, settings):
+        # топы произведений здесь не меняются
+        settings.LEADERBOARD_MIN_REVIEWS = 100
+        title = create_titles_with_genres(1)[0]
+        reviews = []
+        for idx in range(4):
+            author = django_user_model.objects.create_user(
+                username=f'author{idx}', email=f'author{idx}@yamdb.fake'
+            )
+            review = Review.objects.create(
+                title=title, author=author, text='text', score=5
+            )
+            Comment.objects.create(review=review, author=author, text='text')
+            reviews.append(review)
+        Title.objects.rebuild_ratings()
+        # первый запрос кладёт модератора в кеш пользователей
+        moderator_client.get(self.TITLES_URL)
+
+        # запросов на одно действие: выборка объекта вместе с проверкой
+        # прав, запись и, для отзыва, пересчёт рейтинга и топов
+        expected = {'patch': 3, 'delete comment': 2, 'delete review': 7}
+        counts = {flow: set() for flow in expected}
+        for review in reviews:
+            review_url = (
+                self.REVIEWS_URL_TEMPLATE.format(title_id=title.id)
+                + f'{review.id}/'
+            )
+            comment = review.comments.get()
+            comment_url = (
+                self.COMMENTS_URL_TEMPLATE.format(
+                    title_id=title.id, review_id=review.id
+                ) + f'{comment.id}/'
+            )
+            for flow, method, url, data in (
+                ('patch', 'patch', review_url, {'text': 'Скрыто'}),
+                ('delete comment', 'delete', comment_url, None),
+                ('delete review', 'delete', review_url, None),
+            ):
+                with CaptureQueriesContext(connection) as context:
+                    response = getattr(moderator_client, method)(
+                        url, data=data
+                    )
+                assert response.status_code in (200, 204)
+                queries = [query['sql'] for query in context.captured_queries]
+                assert not any(
+                    'FROM "reviews_user"' in sql for sql in queries
+                ), (
+                    'Проверка прав модератора не должна загружать авторов '
+                    f'и пользователя из БД: {queries}'
+                )
+                counts[flow].add(len(queries))
+        assert counts == {
+            flow: {count} for flow, count in expected.items()
+        }, (
+            'Количество запросов при модерации не должно зависеть от '
+            f'объекта и превышать {expected}: {counts}'
+        )
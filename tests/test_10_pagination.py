@@ -0,0 +1,115 @@
+import pytest
+
+from reviews import leaderboards
+from reviews.models import Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10Pagination:
+
+    TITLES_URL = '/api/v1/titles/'
+    REVIEWS_URL_TEMPLATE = '/api/v1/titles/{title_id}/reviews/'
+
+    def collect_cursor_pages(self, client, url):
+        results = []
+        while url:
+            response = client.get(url)
+            assert response.status_code == 200, (
+                f'Проверьте, что GET-запрос к `{url}` возвращает ответ со '
+                'статусом 200.'
+            )
+            data = response.json()
+            assert 'count' not in data, (
+                'В курсорном режиме пагинации ответ не должен содержать '
+                'ключ `count`.'
+            )
+            results.extend(data['results'])
+            url = data['next']
+        return results
+
+    def test_01_page_size(self, client):
+        Title.objects.bulk_create(
+            Title(name=f'Произведение {idx}', year=2000) for idx in range(12)
+        )
+        data = client.get(f'{self.TITLES_URL}?page_size=10').json()
+        assert data['count'] == 12 and len(data['results']) == 10, (
+            f'Проверьте, что `{self.TITLES_URL}` учитывает параметр '
+            '`page_size`.'
+        )
+        data = client.get(f'{self.TITLES_URL}?page_size=100000').json()
+        assert len(data['results']) == 12, (
+            'Размер страницы должен ограничиваться сверху, а не приводить '
+            'к ошибке.'
+        )
+        data = client.get(self.TITLES_URL).json()
+        assert len(data['results']) == 5, (
+            'По умолчанию размер страницы не должен меняться.'
+        )
+
+    def test_02_cursor_mode(self, client, django_user_model):
+        Title.objects.bulk_create(
+            Title(name=f'Произведение {idx}', year=2000) for idx in range(7)
+        )
+        titles = self.collect_cursor_pages(
+            client, f'{self.TITLES_URL}?pagination=cursor'
+        )
+        assert [title['id'] for title in titles] == list(
+            Title.objects.order_by('id').values_list('id', flat=True)
+        ), (
+            f'Курсорный режим `{self.TITLES_URL}` должен вернуть все '
+            'произведения по возрастанию `id` без повторов.'
+        )
+
+        title = Title.objects.first()
+        for idx in range(8):
+            author = django_user_model.objects.create_user(
+                username=f'author{idx}', email=f'author{idx}@yamdb.fake'
+            )
+            Review.objects.create(
+                title=title, author=author, text=f'text {idx}', score=5
+            )
+        reviews = self.collect_cursor_pages(
+            client,
+            self.REVIEWS_URL_TEMPLATE.format(title_id=title.id)
+            + '?pagination=cursor&page_size=3'
+        )
+        assert [review['id'] for review in reviews] == list(
+            Review.objects.order_by('pub_date', 'id').values_list(
+                'id', flat=True
+            )
+        ), (
+            f'Курсорный режим `{self.REVIEWS_URL_TEMPLATE}` должен вернуть '
+            'все отзывы в порядке публикации без повторов.'
+        )
+
+    def test_03_cursor_keeps_requested_order(self, client, settings,
+                                             django_user_model):
+        settings.LEADERBOARD_MIN_REVIEWS = 1
+        in_description = Title.objects.create(
+            name='Фильм', year=2000, description='Побег из тюрьмы'
+        )
+        in_name = Title.objects.create(name='Побег', year=2000)
+        author = django_user_model.objects.create_user(
+            username='author', email='author@yamdb.fake'
+        )
+        for title, score in ((in_description, 3), (in_name, 9)):
+            Review.objects.create(
+                title=title, author=author, text='text', score=score
+            )
+        Title.objects.rebuild_ratings()
+        leaderboards.rebuild()
+        expected = [in_name.id, in_description.id]
+        for params in ({'ordering': '-rating'}, {'search': 'побег'}):
+            response = client.get(
+                self.TITLES_URL, {**params, 'pagination': 'cursor'}
+            )
+            assert response.status_code == 200
+            data = response.json()
+            assert [title['id'] for title in data['results']] == expected, (
+                f'С параметром `{next(iter(params))}` курсорный режим не '
+                'должен менять порядок выдачи.'
+            )
+            assert 'count' in data, (
+                'С сортировкой или поиском должна оставаться постраничная '
+                'пагинация.'
+            )
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+from api import metrics, versions
+from tests.utils import create_titles, sample
+
+
+@pytest.mark.django_db(transaction=True)
+class Test11ResponseCache:
+
+    TITLES_URL = '/api/v1/titles/'
+
+    def cache_counters(self):
+        text = metrics.registry.expose()
+        return {
+            result: sample(
+                text, 'api_response_cache_total'
+                f'{{namespace="titles",result="{result}"}}'
+            ) or 0
+            for result in ('hit', 'miss')
+        }
+
+    def test_01_catalog_is_cached(self, client, admin_client):
+        create_titles(admin_client)
+        before = self.cache_counters()
+        first = client.get(self.TITLES_URL)
+        second = client.get(self.TITLES_URL)
+        assert first['X-Cache'] == 'MISS' and second['X-Cache'] == 'HIT', (
+            f'Повторный GET-запрос к `{self.TITLES_URL}` должен '
+            'обслуживаться из кеша.'
+        )
+        assert first.json() == second.json(), (
+            'Ответ из кеша должен совпадать с исходным ответом.'
+        )
+        assert client.get(f'{self.TITLES_URL}?page=1')['X-Cache'] == 'MISS', (
+            'Параметры запроса должны входить в ключ кеша.'
+        )
+        after = self.cache_counters()
+        assert {
+            result: after[result] - before[result] for result in after
+        } == {'hit': 1, 'miss': 2}, (
+            'Попадания и промахи кеша должны считаться в метриках.'
+        )
+
+    def test_02_writes_invalidate_cache(self, client, admin_client,
+                                        user_client):
+        titles, categories, _ = create_titles(admin_client)
+        title_url = f'{self.TITLES_URL}{titles[0]["id"]}/'
+        client.get(title_url)
+
+        user_client.post(
+            f'{title_url}reviews/', data={'text': 'text', 'score': 7}
+        )
+        response = client.get(title_url)
+        assert response.json()['rating'] == 7, (
+            'Новый отзыв должен сбрасывать кеш произведений.'
+        )
+
+        admin_client.delete(f'/api/v1/categories/{categories[0]["slug"]}/')
+        response = client.get(title_url)
+        assert response.json()['category'] is None, (
+            'Удаление категории должно сбрасывать кеш произведений.'
+        )
+
+        client.get('/api/v1/genres/')
+        admin_client.post(
+            '/api/v1/genres/', data={'name': 'Вестерн', 'slug': 'western'}
+        )
+        response = client.get('/api/v1/genres/')
+        assert response['X-Cache'] == 'MISS', (
+            'Создание жанра должно сбрасывать кеш жанров.'
+        )
+
+    def test_03_versions_are_atomic_and_bounded(self):
+        before = versions.get_namespace_version('titles')
+        threads = [
+            threading.Thread(target=versions.touch_namespaces,
+                             args=('titles',))
+            for _ in range(50)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert versions.get_namespace_version('titles') == before + 50, (
+            'Одновременные записи не должны терять увеличения версии.'
+        )
+        keys = {
+            versions.namespace_key(f'reviews:{title_id}')
+            for title_id in range(10 * versions.NAMESPACE_PARTITIONS)
+        }
+        assert len(keys) <= versions.NAMESPACE_PARTITIONS, (
+            'Число ключей версий не должно расти вместе с данными.'
+        )
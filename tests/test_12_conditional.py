@@ -0,0 +1,114 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from tests.utils import create_reviews
+
+
+@pytest.mark.django_db(transaction=True)
+class Test12ConditionalGet:
+
+    TITLE_DETAIL_URL_TEMPLATE = '/api/v1/titles/{title_id}/'
+    REVIEWS_URL_TEMPLATE = '/api/v1/titles/{title_id}/reviews/'
+    COMMENTS_URL_TEMPLATE = (
+        '/api/v1/titles/{title_id}/reviews/{review_id}/comments/'
+    )
+
+    def check_not_modified(self, client, url):
+        response = client.get(url)
+        etag = response.get('ETag')
+        assert etag and response.get('Last-Modified'), (
+            f'Ответ на GET-запрос к `{url}` должен содержать заголовки '
+            '`ETag` и `Last-Modified`.'
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, (
+            f'GET-запрос к `{url}` с актуальным `If-None-Match` должен '
+            'возвращать ответ со статусом 304.'
+        )
+        assert not context.captured_queries, (
+            'Ответ 304 должен строиться по версиям данных, без запросов '
+            'к БД.'
+        )
+        return etag
+
+    def test_01_titles_and_reviews(self, client, admin_client, admin,
+                                   user_client, user):
+        reviews, titles = create_reviews(admin_client, {admin: admin_client})
+        title_id = titles[0]['id']
+        urls = (
+            self.TITLE_DETAIL_URL_TEMPLATE.format(title_id=title_id),
+            self.REVIEWS_URL_TEMPLATE.format(title_id=title_id),
+            '/api/v1/titles/',
+        )
+        etags = [self.check_not_modified(client, url) for url in urls]
+
+        user_client.post(urls[1], data={'text': 'text', 'score': 1})
+        for url, etag in zip(urls, etags):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 200, (
+                f'После нового отзыва GET-запрос к `{url}` со старым '
+                '`If-None-Match` должен возвращать ответ со статусом 200.'
+            )
+
+    def test_02_comments(self, client, admin_client, admin):
+        reviews, titles = create_reviews(admin_client, {admin: admin_client})
+        url = self.COMMENTS_URL_TEMPLATE.format(
+            title_id=titles[0]['id'], review_id=reviews[0]['id']
+        )
+        response = admin_client.post(url, data={'text': 'comment'})
+        etag = self.check_not_modified(client, url)
+
+        admin_client.patch(
+            f'{url}{response.json()["id"]}/', data={'text': 'edited'}
+        )
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Изменение комментария должно менять `ETag` списка комментариев.'
+        )
+
+    def test_03_cache_hit_without_queries(self, client, admin_client, admin):
+        create_reviews(admin_client, {admin: admin_client})
+        url = '/api/v1/titles/'
+        assert client.get(url)['X-Cache'] == 'MISS'
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        assert response['X-Cache'] == 'HIT' and response.get('ETag')
+        assert not context.captured_queries, (
+            'Ответ из кеша ответов не должен обращаться к БД.'
+        )
+
+    def test_04_cursor_without_count(self, client, admin_client, admin):
+        reviews, titles = create_reviews(admin_client, {admin: admin_client})
+        urls = (
+            '/api/v1/titles/',
+            self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id']),
+        )
+        for url in urls:
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url, {'pagination': 'cursor'})
+            assert response.status_code == 200 and response.get('ETag')
+            assert not [
+                query for query in context.captured_queries
+                if 'COUNT(' in query['sql']
+            ], (
+                f'Запрос страницы `{url}` по курсору не должен считать '
+                'объекты.'
+            )
+
+    def test_05_bulk_load_changes_etag(self, client, admin_client, admin):
+        create_reviews(admin_client, {admin: admin_client})
+        url = '/api/v1/titles/'
+        etag = self.check_not_modified(client, url)
+        call_command(
+            'generate_dataset', users=2, categories=1, genres=1, titles=2,
+            reviews=2, comments=0, stdout=StringIO(),
+        )
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Загрузка данных командой должна менять `ETag` списков.'
+        )
@@ -0,0 +1,199 @@
+import csv
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import (Comment, GenreTitle, LeaderboardEntry, Review,
+                            Title, User)
+
+DATA_PATH = Path(settings.BASE_DIR) / 'static' / 'data'
+
+
+def count_rows(file_name):
+    with open(DATA_PATH / file_name, newline='', encoding='utf-8') as file:
+        return sum(1 for _ in csv.DictReader(file))
+
+
+@pytest.mark.django_db(transaction=True)
+class Test13LoadCsvData:
+
+    def test_01_load_in_batches(self):
+        out = StringIO()
+        call_command('load_csv_data', batch_size=7, stdout=out)
+
+        for model, file_name in (
+            (User, 'users.csv'), (Title, 'titles.csv'),
+            (Review, 'review.csv'), (Comment, 'comments.csv'),
+            (GenreTitle, 'genre_title.csv'),
+        ):
+            assert model.objects.count() == count_rows(file_name), (
+                f'Команда `load_csv_data` должна загрузить все строки '
+                f'`{file_name}`.'
+            )
+        assert 'rows/s' in out.getvalue(), (
+            'Команда `load_csv_data` должна сообщать скорость загрузки.'
+        )
+        call_command('recalculate_ratings', check=True, stdout=StringIO())
+
+    def test_02_import_order(self):
+        from reviews.management.commands.load_csv_data import (
+            MODEL_FILE_MAPPING, import_order
+        )
+        order = import_order(list(MODEL_FILE_MAPPING))
+        for model in order:
+            for field in model._meta.concrete_fields:
+                if field.is_relation and field.related_model in order:
+                    assert order.index(field.related_model) < order.index(
+                        model
+                    ), (
+                        f'`{model.__name__}` должна загружаться после '
+                        f'`{field.related_model.__name__}`.'
+                    )
+
+    def copy_data(self, tmp_path):
+        for file_name in ('users.csv', 'category.csv', 'genre.csv',
+                          'titles.csv', 'review.csv', 'comments.csv',
+                          'genre_title.csv'):
+            (tmp_path / file_name).write_text(
+                (DATA_PATH / file_name).read_text(encoding='utf-8'),
+                encoding='utf-8'
+            )
+
+    def test_03_invalid_row_is_reported(self, tmp_path):
+        self.copy_data(tmp_path)
+        (tmp_path / 'titles.csv').write_text(
+            'id,name,year,category\n1,Broken,not-a-year,1\n',
+            encoding='utf-8'
+        )
+        with pytest.raises(CommandError, match='titles.csv, строка 2'):
+            call_command('load_csv_data', path=tmp_path, stdout=StringIO())
+
+    def test_04_upsert(self, tmp_path):
+        self.copy_data(tmp_path)
+        call_command('load_csv_data', path=tmp_path, stdout=StringIO())
+
+        titles_path = tmp_path / 'titles.csv'
+        original = titles_path.read_text(encoding='utf-8')
+        lines = original.splitlines()
+        first = lines[1].split(',')
+        first[1] = 'Новое название'
+        titles_path.write_text('\n'.join(
+            [lines[0], ','.join(first), *lines[2:], '1000,Новинка,2020,1']
+        ) + '\n', encoding='utf-8')
+
+        out = StringIO()
+        call_command('load_csv_data', path=tmp_path, upsert=True,
+                     stdout=out)
+        assert (
+            'titles.csv is loaded: 33 rows (1 created, 1 updated, 0 deleted)'
+            in out.getvalue()
+        ), (
+            'В режиме `--upsert` команда должна добавлять новые и обновлять '
+            'только изменившиеся строки.'
+        )
+        assert (
+            'review.csv is loaded: 72 rows (0 created, 0 updated, 0 deleted)'
+            in out.getvalue()
+        ), (
+            'В режиме `--upsert` неизменившиеся строки не должны '
+            'перезаписываться.'
+        )
+        assert Title.objects.get(pk=first[0]).name == 'Новое название'
+        assert Review.objects.count() == count_rows('review.csv')
+
+        titles_path.write_text(original, encoding='utf-8')
+        out = StringIO()
+        call_command('load_csv_data', path=tmp_path, upsert=True,
+                     delete_missing=True, stdout=out)
+        assert (
+            'titles.csv is loaded: 32 rows (0 created, 1 updated, 1 deleted)'
+            in out.getvalue()
+        ), (
+            'С `--delete-missing` команда должна удалять строки, которых '
+            'нет в CSV.'
+        )
+        assert not Title.objects.filter(pk=1000).exists()
+        call_command('recalculate_ratings', check=True, stdout=StringIO())
+
+    def test_05_reload_without_cascade_reads(self, settings):
+        settings.LEADERBOARD_MIN_REVIEWS = 1
+        call_command('load_csv_data', stdout=StringIO())
+        group = Group.objects.create(name='Редакторы')
+        group.user_set.add(*User.objects.all())
+        assert LeaderboardEntry.objects.exists()
+
+        with CaptureQueriesContext(connection) as context:
+            call_command('load_csv_data', stdout=StringIO())
+        cascade_reads = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT') and (
+                '"reviews_review"."author_id" IN' in query['sql']
+                or '"reviews_comment"."review_id" IN' in query['sql']
+            )
+        ]
+        assert not cascade_reads, (
+            'Перед загрузкой таблицы должны очищаться без чтения '
+            'каскадно удаляемых строк.'
+        )
+        for model, file_name in (
+            (User, 'users.csv'), (Review, 'review.csv'),
+            (Comment, 'comments.csv'),
+        ):
+            assert model.objects.count() == count_rows(file_name)
+        assert not group.user_set.exists(), (
+            'Связи удалённых пользователей должны удаляться вместе с ними.'
+        )
+
+    def test_06_delete_missing_without_cascade_reads(self, tmp_path):
+        self.copy_data(tmp_path)
+        call_command('load_csv_data', path=tmp_path, stdout=StringIO())
+        author = Comment.objects.first().review.author
+        reviews = set(
+            Review.objects.filter(author=author).values_list('pk', flat=True)
+        )
+        for file_name, keep in (
+            ('users.csv', lambda row: row['id'] != str(author.pk)),
+            ('review.csv', lambda row: int(row['id']) not in reviews),
+            ('comments.csv', lambda row: (
+                int(row['review_id']) not in reviews
+                and row['author'] != str(author.pk)
+            )),
+        ):
+            path = tmp_path / file_name
+            with open(path, newline='', encoding='utf-8') as file:
+                data = csv.DictReader(file)
+                fieldnames, rows = data.fieldnames, list(filter(keep, data))
+            with open(path, 'w', newline='', encoding='utf-8') as file:
+                writer = csv.DictWriter(file, fieldnames)
+                writer.writeheader()
+                writer.writerows(rows)
+
+        out = StringIO()
+        with CaptureQueriesContext(connection) as context:
+            call_command('load_csv_data', path=tmp_path, upsert=True,
+                         delete_missing=True, stdout=out)
+        assert (
+            'users.csv is loaded: 4 rows (0 created, 0 updated, 1 deleted)'
+            in out.getvalue()
+        ), 'С `--delete-missing` команда должна удалить пользователя.'
+        cascade_reads = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT') and (
+                '"reviews_review"."author_id" IN' in query['sql']
+                or '"reviews_comment"."review_id" IN' in query['sql']
+            )
+        ]
+        assert not cascade_reads, (
+            'С `--delete-missing` строки должны удаляться без чтения '
+            'каскадно удаляемых строк.'
+        )
+        assert not User.objects.filter(pk=author.pk).exists()
+        assert not Review.objects.filter(pk__in=reviews).exists()
+        assert not Comment.objects.filter(author=author.pk).exists()
+        call_command('recalculate_ratings', check=True, stdout=StringIO())
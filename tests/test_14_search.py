@@ -0,0 +1,116 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews import search
+from reviews.models import Title
+from tests.utils import create_categories, create_genre
+
+
+@pytest.mark.django_db(transaction=True)
+class Test14TitleSearch:
+
+    TITLES_URL = '/api/v1/titles/'
+
+    def create_title(self, admin_client, name, description, year=1990):
+        genres = [self.genres[0]['slug']]
+        response = admin_client.post(self.TITLES_URL, data={
+            'name': name,
+            'year': year,
+            'genre': genres,
+            'category': self.categories[0]['slug'],
+            'description': description,
+        })
+        assert response.status_code == 201
+        return response.json()['id']
+
+    def search(self, client, query):
+        response = client.get(self.TITLES_URL, {'search': query})
+        assert response.status_code == 200, (
+            f'GET-запрос к `{self.TITLES_URL}?search=` должен возвращать '
+            'ответ со статусом 200.'
+        )
+        return [title['id'] for title in response.json()['results']]
+
+    def test_01_search_ranks_titles(self, client, admin_client):
+        self.genres = create_genre(admin_client)
+        self.categories = create_categories(admin_client)
+        in_description = self.create_title(
+            admin_client, 'Крёстный отец', 'Семья, мафия и побег от прошлого.'
+        )
+        in_name = self.create_title(
+            admin_client, 'Побег из Шоушенка', 'Надежда и тюрьма.'
+        )
+        self.create_title(admin_client, 'Зелёная миля', 'Тюрьма и чудо.')
+
+        assert self.search(client, 'побег') == [in_name, in_description], (
+            'Поиск должен находить произведения по названию и описанию, '
+            'совпадения в названии - выше.'
+        )
+        assert self.search(client, 'ПОБЕГ тюрьм') == [in_name], (
+            'Поиск не должен зависеть от регистра, слова запроса '
+            'ищутся по префиксу и должны встречаться все.'
+        )
+        assert self.search(client, '"*') == [], (
+            'Запрос без слов не должен приводить к ошибке.'
+        )
+        assert self.search(client, 'мафия" (побег*') == [
+            in_description
+        ], (
+            'Служебные символы FTS в запросе не должны приводить к ошибке.'
+        )
+
+        admin_client.patch(
+            f'{self.TITLES_URL}{in_description}/', data={'name': 'Беглец'}
+        )
+        assert self.search(client, 'беглец') == [in_description], (
+            'Изменение названия должно попадать в поисковый индекс.'
+        )
+        admin_client.delete(f'{self.TITLES_URL}{in_name}/')
+        assert self.search(client, 'шоушенка') == [], (
+            'Удалённое произведение не должно находиться поиском.'
+        )
+        response = client.get(
+            self.TITLES_URL, {'search': 'тюрьма', 'year': 1990}
+        )
+        assert response.json()['count'] == 1, (
+            'Поиск должен сочетаться с фильтрами произведений.'
+        )
+
+    def test_02_migrate_restores_triggers(self, client):
+        if connection.vendor != 'sqlite':
+            pytest.skip('Триггеры индекса есть только в SQLite')
+        # так пересоздание reviews_title миграцией удаляет триггеры
+        search.execute_all(connection, [
+            statement for statement in search.SQLITE_UNINSTALL
+            if 'TRIGGER' in statement
+        ])
+        assert not search.is_installed(connection)
+        call_command('migrate', verbosity=0, stdout=StringIO())
+        assert search.is_installed(connection), (
+            '`migrate` должен восстанавливать триггеры поискового индекса.'
+        )
+        title = Title.objects.create(name='Побег', year=1990)
+        assert self.search(client, 'побег') == [title.id]
+
+    def test_03_match_runs_once(self, client):
+        if connection.vendor != 'sqlite':
+            pytest.skip('Запрос к FTS5 есть только в SQLite')
+        Title.objects.bulk_create(
+            Title(name=f'Побег {idx}', year=1990) for idx in range(20)
+        )
+        with CaptureQueriesContext(connection) as context:
+            assert len(self.search(client, 'побег')) == 5
+        searches = [
+            query['sql'] for query in context.captured_queries
+            if 'MATCH' in query['sql']
+        ]
+        assert searches and all(
+            sql.count('MATCH') == 1 for sql in searches
+        ), (
+            'Полнотекстовый запрос должен выполняться один раз, а не '
+            'подзапросом для каждой найденной строки.'
+        )
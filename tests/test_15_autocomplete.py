@@ -0,0 +1,108 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.autocomplete import AutocompleteIndex, autocomplete_index
+from reviews.models import Category, Genre, Title
+from tests.utils import create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test15Autocomplete:
+
+    AUTOCOMPLETE_URL = '/api/v1/autocomplete/'
+
+    def complete(self, client, query, **params):
+        response = client.get(self.AUTOCOMPLETE_URL, {'q': query, **params})
+        assert response.status_code == 200, (
+            f'GET-запрос к `{self.AUTOCOMPLETE_URL}` должен возвращать '
+            'ответ со статусом 200.'
+        )
+        return response.json()
+
+    def test_01_autocomplete(self, client, admin_client):
+        titles, categories, genres = create_titles(admin_client)
+
+        assert self.complete(client, 'ко') == [
+            {'type': 'genre', 'name': 'Комедия', 'slug': 'comedy'},
+        ], 'Автодополнение должно искать по началу названия.'
+        assert self.complete(client, 'ОРЕ') == [
+            {'type': 'title', 'name': 'Крепкий орешек',
+             'id': titles[1]['id']},
+        ], (
+            'Автодополнение должно искать по началу любого слова без учёта '
+            'регистра.'
+        )
+        assert self.complete(client, 'ф', type='title') == [], (
+            'Автодополнение должно учитывать параметр `type`.'
+        )
+        assert len(self.complete(client, 'к', limit=1)) == 1, (
+            'Автодополнение должно учитывать параметр `limit`.'
+        )
+        response = client.get(self.AUTOCOMPLETE_URL, {'q': 'к', 'type': 'x'})
+        assert response.status_code == 400
+
+        admin_client.post(
+            '/api/v1/genres/', data={'name': 'Комикс', 'slug': 'comics'}
+        )
+        admin_client.patch(
+            f'/api/v1/titles/{titles[0]["id"]}/', data={'name': 'Киборг'}
+        )
+        admin_client.delete('/api/v1/genres/comedy/')
+        assert self.complete(client, 'ко') == [
+            {'type': 'genre', 'name': 'Комикс', 'slug': 'comics'},
+        ], 'Индекс автодополнения должен обновляться при записи.'
+        assert [
+            match['name'] for match in self.complete(client, 'ки')
+        ] == ['Киборг'], 'Индекс автодополнения должен обновляться при записи.'
+
+    def test_02_writes_outside_api(self, client):
+        assert self.complete(client, 'кат') == []
+        # так пишут админка и shell
+        Category.objects.create(name='Кино', slug='cinema')
+        assert self.complete(client, 'кин') == [
+            {'type': 'category', 'name': 'Кино', 'slug': 'cinema'},
+        ], 'Индекс автодополнения должен видеть запись через модели.'
+
+        call_command(
+            'generate_dataset', users=1, categories=1, genres=1, titles=1,
+            reviews=0, comments=0, stdout=StringIO(),
+        )
+        assert [
+            match['type'] for match in self.complete(client, 'катего')
+        ] == ['category'], (
+            'Индекс автодополнения должен перестраиваться после загрузки '
+            'данных командой.'
+        )
+
+    def test_03_incremental_updates(self):
+        # индекс другого процесса: в этом процессе его меняет только журнал
+        worker = AutocompleteIndex()
+        worker.warm_up()
+        Genre.objects.create(name='Вестерн', slug='western')
+        title = Title.objects.create(name='Вестсайдская история', year=1961)
+        with CaptureQueriesContext(connection) as context:
+            found = worker.search('вест')
+        assert [name for _, _, name in found] == [
+            'Вестерн', 'Вестсайдская история'
+        ], 'Индекс должен видеть изменения, сделанные другим процессом.'
+        assert not context.captured_queries, (
+            'Изменения должны применяться к индексу без его перестройки.'
+        )
+
+        title.delete()
+        with CaptureQueriesContext(connection) as context:
+            found = worker.search('вест')
+        assert [name for _, _, name in found] == ['Вестерн']
+        assert not context.captured_queries
+
+        autocomplete_index.invalidate()
+        with CaptureQueriesContext(connection) as context:
+            found = worker.search('вест')
+        assert [name for _, _, name in found] == ['Вестерн']
+        assert context.captured_queries, (
+            'После invalidate() индекс должен перестраиваться из базы.'
+        )
@@ -0,0 +1,68 @@
+import pytest
+
+from reviews.models import Category, Genre, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test16TitleFilters:
+
+    TITLES_URL = '/api/v1/titles/'
+
+    def filter_titles(self, client, params):
+        response = client.get(self.TITLES_URL, params)
+        assert response.status_code == 200, (
+            f'GET-запрос к `{self.TITLES_URL}` с фильтрами должен '
+            'возвращать ответ со статусом 200.'
+        )
+        data = response.json()
+        ids = [title['id'] for title in data['results']]
+        assert data['count'] == len(ids), (
+            'Количество найденных произведений не должно учитывать '
+            'дубликаты.'
+        )
+        return sorted(ids)
+
+    def test_01_multiple_genres_and_categories(self, client):
+        films = Category.objects.create(name='Фильм', slug='films')
+        books = Category.objects.create(name='Книга', slug='books')
+        music = Category.objects.create(name='Музыка', slug='music')
+        drama, comedy, horror = (
+            Genre.objects.create(name=slug, slug=slug)
+            for slug in ('drama', 'comedy', 'horror')
+        )
+        both = Title.objects.create(name='Оба', year=2000, category=films)
+        both.genre.set([drama, comedy])
+        only_drama = Title.objects.create(
+            name='Драма', year=2000, category=books
+        )
+        only_drama.genre.set([drama])
+        scary = Title.objects.create(name='Ужас', year=2000, category=music)
+        scary.genre.set([horror])
+
+        assert self.filter_titles(client, {'genre': 'drama,comedy'}) == [
+            both.id, only_drama.id
+        ], (
+            'Фильтр по нескольким жанрам должен возвращать произведения '
+            'хотя бы с одним из жанров, каждое - один раз.'
+        )
+        assert self.filter_titles(
+            client, {'genre': 'drama,comedy', 'genre_match': 'all'}
+        ) == [both.id], (
+            'С `genre_match=all` должны возвращаться произведения со всеми '
+            'перечисленными жанрами.'
+        )
+        assert self.filter_titles(
+            client, {'category': 'films,music'}
+        ) == [both.id, scary.id], (
+            'Фильтр по нескольким категориям должен возвращать произведения '
+            'любой из них.'
+        )
+        assert self.filter_titles(
+            client, {'category': 'films,books', 'genre': 'drama'}
+        ) == [both.id, only_drama.id]
+
+        response = client.get(self.TITLES_URL, {'genre_match': 'some'})
+        assert response.status_code == 400, (
+            'Неизвестное значение `genre_match` должно возвращать ответ со '
+            'статусом 400.'
+        )
@@ -0,0 +1,165 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews import leaderboards
+from reviews.models import Category, Genre, LeaderboardEntry, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test17Leaderboards:
+
+    TITLES_URL = '/api/v1/titles/'
+    REVIEWS_URL_TEMPLATE = '/api/v1/titles/{title_id}/reviews/'
+
+    def create_title(self, name, year, category, genre):
+        title = Title.objects.create(name=name, year=year, category=category)
+        title.genre.set([genre])
+        return title
+
+    def review(self, author_client, title, score):
+        response = author_client.post(
+            self.REVIEWS_URL_TEMPLATE.format(title_id=title.id),
+            data={'text': 'Отзыв', 'score': score}
+        )
+        assert response.status_code == 201
+        return response.json()['id']
+
+    def top(self, client, **params):
+        response = client.get(
+            self.TITLES_URL, {'ordering': '-rating', **params}
+        )
+        assert response.status_code == 200, (
+            f'GET-запрос к `{self.TITLES_URL}?ordering=-rating` должен '
+            'возвращать ответ со статусом 200.'
+        )
+        return [title['name'] for title in response.json()['results']]
+
+    def snapshot(self):
+        return set(LeaderboardEntry.objects.values_list(
+            'scope', 'key', 'title_id', 'rating', 'review_count'
+        ))
+
+    def test_01_leaderboards_follow_reviews(self, client, user_client,
+                                            moderator_client, settings):
+        settings.LEADERBOARD_SIZE = 2
+        settings.LEADERBOARD_MIN_REVIEWS = 1
+        films = Category.objects.create(name='Фильм', slug='films')
+        books = Category.objects.create(name='Книга', slug='books')
+        drama = Genre.objects.create(name='Драма', slug='drama')
+        comedy = Genre.objects.create(name='Комедия', slug='comedy')
+        first = self.create_title('Первое', 2000, films, drama)
+        second = self.create_title('Второе', 2000, films, comedy)
+        third = self.create_title('Третье', 2001, books, drama)
+        self.create_title('Без отзывов', 2001, books, drama)
+
+        first_review = self.review(user_client, first, 9)
+        second_review = self.review(user_client, second, 7)
+        self.review(user_client, third, 5)
+
+        assert self.top(client) == ['Первое', 'Второе'], (
+            'С `ordering=-rating` должны возвращаться лучшие произведения '
+            'по убыванию рейтинга, не больше `LEADERBOARD_SIZE`.'
+        )
+        assert self.top(client, genre='drama') == ['Первое', 'Третье'], (
+            'Топ должен строиться отдельно для жанра.'
+        )
+        assert self.top(client, category='books') == ['Третье'], (
+            'Топ должен строиться отдельно для категории и не включать '
+            'произведения с числом отзывов меньше порога.'
+        )
+        assert self.top(client, year=2000) == ['Первое', 'Второе'], (
+            'Топ должен строиться отдельно для года.'
+        )
+
+        user_client.patch(
+            f'{self.REVIEWS_URL_TEMPLATE.format(title_id=first.id)}'
+            f'{first_review}/',
+            data={'score': 1}
+        )
+        assert self.top(client) == ['Второе', 'Третье'], (
+            'Опустившееся произведение должно уступать место в топе '
+            'произведению, которое было за его пределами.'
+        )
+        self.review(moderator_client, first, 10)
+        assert self.top(client) == ['Второе', 'Первое'], (
+            'Поднявшееся произведение должно возвращаться в топ.'
+        )
+        user_client.delete(
+            f'{self.REVIEWS_URL_TEMPLATE.format(title_id=second.id)}'
+            f'{second_review}/'
+        )
+        assert self.top(client) == ['Первое', 'Третье'], (
+            'Произведение без отзывов должно выбывать из топа.'
+        )
+
+        incremental = self.snapshot()
+        call_command('recalculate_ratings', stdout=StringIO())
+        assert self.snapshot() == incremental, (
+            'Топы после обновлений отзывов должны совпадать с топами, '
+            'пересобранными с нуля.'
+        )
+
+        response = client.get(self.TITLES_URL, {'ordering': 'name'})
+        assert response.status_code == 400, (
+            'Неизвестное значение `ordering` должно возвращать ответ со '
+            'статусом 400.'
+        )
+
+    def test_02_top_is_read_from_index(self, client, settings):
+        settings.RESPONSE_CACHE_ALIAS = None
+        Title.objects.create(
+            name='Произведение', year=2000, rating=5, review_count=3
+        )
+        leaderboards.rebuild()
+        with CaptureQueriesContext(connection) as context:
+            client.get(self.TITLES_URL, {'ordering': '-rating'})
+        query = next(
+            query['sql'] for query in context.captured_queries
+            if 'reviews_leaderboardentry' in query['sql']
+            and 'LIMIT' in query['sql']
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {query}')
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        assert 'leaderboard_rank_idx' in plan and 'TEMP B-TREE' not in plan, (
+            'Страница топа должна читаться по индексу '
+            f'`leaderboard_rank_idx` без сортировки. План: {plan}'
+        )
+
+    def test_03_filters_outside_board_scope(self, client, settings,
+                                            django_user_model):
+        settings.LEADERBOARD_SIZE = 1
+        settings.LEADERBOARD_MIN_REVIEWS = 1
+        films = Category.objects.create(name='Фильм', slug='films')
+        drama = Genre.objects.create(name='Драма', slug='drama')
+        comedy = Genre.objects.create(name='Комедия', slug='comedy')
+        best = self.create_title('Лучшее', 2000, films, drama)
+        good = self.create_title('Хорошее', 2000, films, comedy)
+        worst = self.create_title('Побег', 2001, films, drama)
+        for title, rating in ((best, 9), (good, 7), (worst, 3)):
+            Title.objects.filter(pk=title.pk).update(
+                rating=rating, review_count=1, score_sum=rating
+            )
+        leaderboards.rebuild()
+
+        assert self.top(client, genre='drama,comedy') == [
+            'Лучшее', 'Хорошее', 'Побег'
+        ], (
+            'С несколькими жанрами `ordering=-rating` должен сортировать '
+            'все подходящие произведения, а не позиции одного топа.'
+        )
+        assert self.top(client, name='Побег') == ['Побег'], (
+            'С фильтром `name` произведение вне топа не должно пропадать.'
+        )
+        assert self.top(client, genre='drama', year=2001) == ['Побег']
+        assert self.top(client, search='хорошее') == ['Хорошее'], (
+            'Поиск вместе с `ordering=-rating` должен искать среди всех '
+            'произведений.'
+        )
+        assert self.top(client, category='films') == ['Лучшее'], (
+            'Фильтр, совпадающий с областью топа, должен читать топ.'
+        )
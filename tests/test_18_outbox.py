@@ -0,0 +1,111 @@
+import smtplib
+from io import StringIO
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.utils import timezone
+
+from reviews.models import OutgoingEmail
+
+
+class CountingBackend(EmailBackend):
+    connections = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        CountingBackend.connections += 1
+
+
+class FailingBackend(BaseEmailBackend):
+
+    def send_messages(self, email_messages):
+        raise smtplib.SMTPServerDisconnected('SMTP недоступен')
+
+
+@pytest.mark.django_db(transaction=True)
+class Test18Outbox:
+
+    SIGNUP_URL = '/api/v1/auth/signup/'
+
+    def enqueue(self, count):
+        for idx in range(count):
+            OutgoingEmail.objects.create(
+                subject='Тема', body='Текст', from_email='yamdb@yamdb.fake',
+                recipients=f'user{idx}@yamdb.fake'
+            )
+
+    def test_01_signup_enqueues_mail(self, client, settings):
+        settings.EMAIL_OUTBOX_EAGER = False
+        response = client.post(self.SIGNUP_URL, data={
+            'email': 'valid@yamdb.fake', 'username': 'valid-username'
+        })
+        assert response.status_code == 200
+        assert len(mail.outbox) == 0, (
+            'Регистрация должна ставить письмо в очередь, а не отправлять '
+            'его во время запроса.'
+        )
+        assert OutgoingEmail.objects.filter(
+            status=OutgoingEmail.Status.PENDING
+        ).count() == 1
+
+        call_command('send_outbox', stdout=StringIO())
+        assert [message.to for message in mail.outbox] == [
+            ['valid@yamdb.fake']
+        ], 'Команда `send_outbox` должна отправлять письма из очереди.'
+        assert OutgoingEmail.objects.get().status == (
+            OutgoingEmail.Status.SENT
+        )
+
+    @pytest.mark.parametrize('workers,connections', ((1, 1), (3, 3)))
+    def test_02_batches_reuse_connection(self, settings, workers,
+                                         connections):
+        settings.EMAIL_BACKEND = 'tests.test_18_outbox.CountingBackend'
+        CountingBackend.connections = 0
+        self.enqueue(7)
+        call_command(
+            'send_outbox', batch_size=3 if workers > 1 else 10,
+            workers=workers, stdout=StringIO()
+        )
+        assert len(mail.outbox) == 7
+        assert CountingBackend.connections == connections, (
+            'Каждая пачка писем должна отправляться через одно соединение.'
+        )
+
+    def test_03_failed_mail_is_retried_later(self, settings):
+        settings.EMAIL_BACKEND = 'tests.test_18_outbox.FailingBackend'
+        self.enqueue(1)
+        call_command('send_outbox', max_attempts=2, stdout=StringIO())
+        email = OutgoingEmail.objects.get()
+        assert email.status == OutgoingEmail.Status.PENDING
+        assert email.attempts == 1
+        assert email.next_attempt > timezone.now(), (
+            'Неотправленное письмо должно откладываться на следующую '
+            'попытку.'
+        )
+        assert 'SMTP недоступен' in email.last_error
+
+        call_command('send_outbox', max_attempts=2, stdout=StringIO())
+        assert OutgoingEmail.objects.get().attempts == 1, (
+            'Письмо не должно отправляться повторно раньше срока.'
+        )
+
+        OutgoingEmail.objects.update(next_attempt=timezone.now())
+        call_command('send_outbox', max_attempts=2, stdout=StringIO())
+        assert OutgoingEmail.objects.get().status == (
+            OutgoingEmail.Status.FAILED
+        ), 'После последней попытки письмо должно помечаться как failed.'
+
+    def test_04_smtp_failure_does_not_break_signup(self, client, settings):
+        settings.EMAIL_BACKEND = 'tests.test_18_outbox.FailingBackend'
+        response = client.post(self.SIGNUP_URL, data={
+            'email': 'valid@yamdb.fake', 'username': 'valid-username'
+        })
+        assert response.status_code == 200, (
+            'Сбой SMTP не должен приводить к ошибке регистрации.'
+        )
+        assert OutgoingEmail.objects.get().status == (
+            OutgoingEmail.Status.PENDING
+        ), 'Неотправленное письмо должно остаться в очереди.'
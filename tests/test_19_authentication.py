@@ -0,0 +1,166 @@
+import shutil
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from django.conf import settings as django_settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.authentication import check_settings, get_access_token
+from reviews.models import Title, User
+
+
+def client_for(user):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Bearer {get_access_token(user)}'
+    )
+    return client
+
+
+def user_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    return response, [
+        query['sql'] for query in context.captured_queries
+        if 'FROM "reviews_user"' in query['sql']
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test19CachedAuthentication:
+
+    ME_URL = '/api/v1/users/me/'
+    USERS_URL = '/api/v1/users/'
+
+    def test_01_user_is_cached(self, admin, user, admin_client):
+        client = client_for(user)
+        response, first = user_queries(client, self.USERS_URL)
+        assert response.status_code == 403
+        response, second = user_queries(client, self.USERS_URL)
+        assert response.status_code == 403
+        assert len(first) == 1 and not second, (
+            'Пользователь из токена должен браться из кеша, а не из БД '
+            'при каждом запросе.'
+        )
+
+        admin_client.patch(
+            f'{self.USERS_URL}{user.username}/', data={'role': 'admin'}
+        )
+        response = client.get(self.USERS_URL)
+        assert response.status_code == 200, (
+            'Изменение роли через API должно сбрасывать кеш пользователя.'
+        )
+
+        admin_client.delete(f'{self.USERS_URL}{user.username}/')
+        response = client.get(self.ME_URL)
+        assert response.status_code == 401, (
+            'Удалённый пользователь не должен аутентифицироваться по '
+            'закешированным данным.'
+        )
+
+    def test_02_user_from_claims(self, user, admin_client, settings):
+        settings.AUTH_USER_FROM_CLAIMS = True
+        client = client_for(user)
+        response, queries = user_queries(client, self.USERS_URL)
+        assert response.status_code == 403
+        assert not queries, (
+            'С `AUTH_USER_FROM_CLAIMS` пользователь должен строиться из '
+            'claims токена без запроса к БД.'
+        )
+        title = Title.objects.create(name='Произведение', year=2000)
+        response = client.post(
+            f'/api/v1/titles/{title.id}/reviews/',
+            data={'text': 'Отзыв', 'score': 5}
+        )
+        assert response.status_code == 201
+        assert response.json()['author'] == user.username, (
+            'Пользователь из claims должен подходить для записи отзывов.'
+        )
+
+        admin_client.patch(
+            f'{self.USERS_URL}{user.username}/', data={'role': 'admin'}
+        )
+        response = client.get(self.USERS_URL)
+        assert response.status_code == 200, (
+            'Токен, выданный до изменения роли, не должен давать прежнюю '
+            'роль.'
+        )
+        response = client.get(self.ME_URL)
+        assert response.json()['email'] == user.email
+
+    def test_03_role_change_outside_api(self, user, settings):
+        settings.AUTH_USER_FROM_CLAIMS = True
+        client = client_for(user)
+        assert client.get(self.USERS_URL).status_code == 403
+        # так роль меняют админка и shell
+        user.role = 'admin'
+        user.save()
+        response = client.get(self.USERS_URL)
+        assert response.status_code == 200, (
+            'Сохранение пользователя вне API должно сбрасывать роль из '
+            'claims и кеша.'
+        )
+
+    def test_04_claims_require_shared_versions(self, settings, tmp_path):
+        settings.AUTH_USER_FROM_CLAIMS = True
+        with pytest.raises(ImproperlyConfigured):
+            check_settings()
+        # в продакшене - memcached; для проверки подходит любой общий кеш
+        settings.CACHES = {**settings.CACHES, 'shared': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path),
+        }}
+        settings.VERSION_CACHE_ALIAS = 'shared'
+        check_settings()
+        settings.VERSION_CACHE_ALIAS = 'versions'
+        settings.AUTH_USER_FROM_CLAIMS = False
+        check_settings()
+
+    def test_05_role_change_by_load_csv_data(self, settings, tmp_path):
+        settings.AUTH_USER_FROM_CLAIMS = True
+        data_path = Path(django_settings.BASE_DIR) / 'static' / 'data'
+        shutil.copytree(data_path, tmp_path, dirs_exist_ok=True)
+        call_command('load_csv_data', path=tmp_path, stdout=StringIO())
+        client = client_for(User.objects.get(username='capt_obvious'))
+        assert client.get(self.USERS_URL).status_code == 200
+
+        users_path = tmp_path / 'users.csv'
+        users_path.write_text(users_path.read_text(encoding='utf-8').replace(
+            'capt_obvious@yamdb.fake,admin', 'capt_obvious@yamdb.fake,user'
+        ), encoding='utf-8')
+        call_command('load_csv_data', path=tmp_path, upsert=True,
+                     stdout=StringIO())
+        assert client.get(self.USERS_URL).status_code == 403, (
+            'Изменение роли загрузкой данных должно действовать на уже '
+            'выданные токены.'
+        )
+
+    def test_06_failed_load_csv_data_drops_users(self, settings, tmp_path):
+        settings.AUTH_USER_FROM_CLAIMS = True
+        data_path = Path(django_settings.BASE_DIR) / 'static' / 'data'
+        shutil.copytree(data_path, tmp_path, dirs_exist_ok=True)
+        call_command('load_csv_data', path=tmp_path, stdout=StringIO())
+        client = client_for(User.objects.get(username='capt_obvious'))
+        assert client.get(self.USERS_URL).status_code == 200
+
+        users_path = tmp_path / 'users.csv'
+        users_path.write_text(''.join(
+            line for line in users_path.read_text(
+                encoding='utf-8'
+            ).splitlines(keepends=True) if 'capt_obvious' not in line
+        ), encoding='utf-8')
+        (tmp_path / 'titles.csv').write_text(
+            'id,name,year,category\n1,Broken,not-a-year,1\n',
+            encoding='utf-8'
+        )
+        with pytest.raises(CommandError):
+            call_command('load_csv_data', path=tmp_path, stdout=StringIO())
+        assert client.get(self.USERS_URL).status_code == 401, (
+            'Токены пользователей, удалённых загрузкой данных, не должны '
+            'действовать, даже если загрузка прервалась.'
+        )
@@ -0,0 +1,90 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Comment, Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test20BulkModeration:
+
+    REVIEWS_URL = '/api/v1/moderation/reviews/delete/'
+    COMMENTS_URL = '/api/v1/moderation/comments/delete/'
+
+    def create_data(self, spammer, user):
+        titles = [
+            Title.objects.create(name=f'Произведение {idx}', year=2000)
+            for idx in range(2)
+        ]
+        for title in titles:
+            Review.objects.create(
+                title=title, author=spammer, text='Спам', score=1
+            )
+        review = Review.objects.create(
+            title=titles[0], author=user, text='Отзыв', score=9
+        )
+        comments = [
+            Comment.objects.create(review=review, author=author, text='text')
+            for author in (spammer, spammer, user)
+        ]
+        Title.objects.rebuild_ratings()
+        return titles, review, comments
+
+    def test_01_delete_reviews_by_author(self, user_client, moderator_client,
+                                         django_user_model, user):
+        spammer = django_user_model.objects.create_user(
+            username='spammer', email='spammer@yamdb.fake'
+        )
+        titles, review, _ = self.create_data(spammer, user)
+
+        response = user_client.post(
+            self.REVIEWS_URL, data={'author': spammer.username}
+        )
+        assert response.status_code == 403, (
+            'Массовое удаление должно быть доступно только модератору и '
+            'администратору.'
+        )
+        response = moderator_client.post(self.REVIEWS_URL, data={})
+        assert response.status_code == 400, (
+            'Без `ids` и `author` массовое удаление должно возвращать '
+            'ответ со статусом 400.'
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            response = moderator_client.post(
+                self.REVIEWS_URL, data={'author': spammer.username}
+            )
+        assert response.status_code == 200
+        assert response.json() == {'reviews': 2, 'comments': 0}
+        assert list(Review.objects.all()) == [review]
+        rating_updates = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "reviews_title"')
+        ]
+        assert len(rating_updates) == len(titles), (
+            'Рейтинг каждого затронутого произведения должен обновляться '
+            'один раз.'
+        )
+        assert Title.objects.get(pk=titles[0].pk).rating == 9
+        assert Title.objects.get(pk=titles[1].pk).rating is None
+        call_command('recalculate_ratings', check=True, stdout=StringIO())
+
+    def test_02_delete_comments_by_ids(self, moderator_client,
+                                       django_user_model, user):
+        spammer = django_user_model.objects.create_user(
+            username='spammer', email='spammer@yamdb.fake'
+        )
+        _, review, comments = self.create_data(spammer, user)
+        response = moderator_client.post(
+            self.COMMENTS_URL,
+            data={'ids': [comments[0].id, comments[2].id]},
+            format='json'
+        )
+        assert response.status_code == 200
+        assert response.json() == {'reviews': 0, 'comments': 2}
+        assert list(review.comments.all()) == [comments[1]], (
+            'Массовое удаление должно удалять комментарии из списка `ids`.'
+        )
@@ -0,0 +1,131 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.autocomplete import VERSION_KEY
+from api.versions import get_cache, get_version
+from reviews.models import Category, Genre, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test21BulkTitles:
+
+    BULK_URL = '/api/v1/titles/bulk/'
+
+    @pytest.fixture
+    def catalog(self):
+        Category.objects.create(name='Фильм', slug='films')
+        Genre.objects.create(name='Драма', slug='drama')
+        Genre.objects.create(name='Комедия', slug='comedy')
+
+    def post(self, client, items):
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(self.BULK_URL, data=items, format='json')
+        return response, len(context.captured_queries)
+
+    def test_01_bulk_create_and_update(self, admin_client, user_client,
+                                       catalog):
+        existing = Title.objects.create(name='Старое', year=1990)
+        response, _ = self.post(user_client, [{'name': 'x'}])
+        assert response.status_code == 403, (
+            'Массовая запись произведений должна быть доступна только '
+            'администратору.'
+        )
+
+        response, _ = self.post(admin_client, [
+            {'name': 'Первое', 'year': 2000, 'category': 'films',
+             'genre': ['drama', 'comedy', 'drama']},
+            {'name': 'Без категории', 'year': 2000, 'category': 'nope',
+             'genre': ['drama']},
+            {'name': 'Второе', 'year': 2001, 'category': 'films',
+             'genre': [], 'description': 'Описание'},
+            {'id': existing.id, 'name': 'Новое', 'genre': ['comedy']},
+            {'id': 100500, 'name': 'Нет такого'},
+            {'name': 'Будущее', 'year': 3000, 'category': 'films',
+             'genre': []},
+        ])
+        assert response.status_code == 200
+        data = response.json()
+        assert (data['created'], data['updated'], data['failed']) == (
+            2, 1, 3
+        ), 'Ошибки в отдельных элементах не должны отменять всю пачку.'
+        results = data['results']
+        assert [result['index'] for result in results] == list(range(6))
+        assert results[1]['errors'] == {
+            'category': ['Объект с slug=nope не существует.']
+        }, 'Ошибки элементов должны совпадать с ошибками POST-запроса.'
+        assert 'id' in results[4]['errors']
+        assert 'year' in results[5]['errors']
+
+        first = Title.objects.get(pk=results[0]['id'])
+        assert first.name == 'Первое' and first.category.slug == 'films'
+        assert sorted(first.genre.values_list('slug', flat=True)) == [
+            'comedy', 'drama'
+        ], 'Созданные произведения должны быть связаны с жанрами.'
+        assert Title.objects.get(pk=results[2]['id']).name == 'Второе'
+        existing.refresh_from_db()
+        assert existing.name == 'Новое' and existing.year == 1990
+        assert list(existing.genre.values_list('slug', flat=True)) == [
+            'comedy'
+        ], 'Изменение жанров должно заменять связи произведения.'
+
+        response = admin_client.get('/api/v1/titles/', {'search': 'второе'})
+        assert [title['id'] for title in response.json()['results']] == [
+            results[2]['id']
+        ], 'Созданные пачкой произведения должны находиться поиском.'
+
+    def test_02_bulk_query_count(self, admin_client, catalog, settings):
+        def items(count):
+            return [
+                {'name': f'Произведение {idx}', 'year': 2000,
+                 'category': 'films', 'genre': ['drama', 'comedy']}
+                for idx in range(count)
+            ]
+        # первый запрос кладёт администратора в кеш пользователей
+        admin_client.get('/api/v1/titles/')
+        _, few = self.post(admin_client, items(2))
+        _, many = self.post(admin_client, items(30))
+        assert few == many, (
+            'Количество запросов массовой записи не должно зависеть от '
+            'числа произведений в пачке.'
+        )
+        assert Title.objects.count() == 32
+
+    def test_03_repeated_id(self, admin_client, catalog):
+        title = Title.objects.create(name='Старое', year=1990)
+        response, _ = self.post(admin_client, [
+            {'id': title.id, 'genre': ['drama']},
+            {'id': title.id, 'genre': ['drama'], 'name': 'z'},
+        ])
+        assert response.status_code == 200, (
+            'Повтор id в пачке не должен приводить к ошибке сервера.'
+        )
+        data = response.json()
+        assert data['updated'] == 1 and data['failed'] == 1
+        assert 'id' in data['results'][1]['errors'], (
+            'Повторный id должен возвращаться как ошибка элемента.'
+        )
+        title.refresh_from_db()
+        assert title.name == 'Старое'
+        assert list(title.genre.values_list('slug', flat=True)) == ['drama']
+
+    def test_04_ids_of_large_batch(self, admin_client, catalog):
+        # счётчик AUTOINCREMENT теперь больше max(id)
+        Title.objects.create(name='Старое', year=1990).delete()
+        version = get_version(get_cache(), VERSION_KEY)
+        response, _ = self.post(admin_client, [
+            {'name': f'Произведение {idx}', 'year': 2000,
+             'category': 'films', 'genre': []}
+            for idx in range(500)
+        ])
+        assert response.json()['created'] == 500
+        names = dict(Title.objects.values_list('id', 'name'))
+        assert [
+            names.get(result['id']) for result in response.json()['results']
+        ] == [f'Произведение {idx}' for idx in range(500)], (
+            'Ответ должен содержать id созданных произведений, даже если '
+            'пачка вставляется несколькими INSERT.'
+        )
+        assert get_version(get_cache(), VERSION_KEY) == version + 1, (
+            'Индекс подсказок должен обновляться один раз на пачку.'
+        )
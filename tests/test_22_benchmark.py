@@ -0,0 +1,45 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from api.benchmark import get_route_names
+
+
+@pytest.mark.django_db(transaction=True)
+class Test22Benchmark:
+
+    def benchmark(self, **options):
+        call_command(
+            'benchmark', in_place=True, titles=3, reviews=6, comments=6,
+            users=5, repeat=2, stdout=StringIO(), **options
+        )
+
+    def test_01_baseline_and_compare(self, tmp_path):
+        baseline = tmp_path / 'baseline.json'
+        self.benchmark(output=baseline)
+        results = json.loads(baseline.read_text(encoding='utf-8'))['results']
+        assert {
+            metrics['route'] for metrics in results.values()
+        } == get_route_names(), (
+            'Бенчмарк должен проходить по всем маршрутам api.'
+        )
+        for metrics in results.values():
+            assert set(metrics) >= {'queries', 'p50_ms', 'p99_ms', 'peak_kb'}
+
+    def test_02_compare_fails_on_regression(self, tmp_path):
+        baseline = tmp_path / 'baseline.json'
+        self.benchmark(output=baseline)
+        data = json.loads(baseline.read_text(encoding='utf-8'))
+        data['results']['titles list']['queries'] -= 1
+        baseline.write_text(json.dumps(data), encoding='utf-8')
+        call_command('flush', interactive=False, stdout=StringIO())
+        # время на маленьком прогоне шумное, проверяем только запросы
+        with pytest.raises(CommandError, match='titles list: запросов'):
+            self.benchmark(compare=baseline, threshold=1000)
+
+    def test_03_in_place_requires_empty_database(self):
+        self.benchmark()
+        with pytest.raises(CommandError):
+            self.benchmark()
@@ -0,0 +1,87 @@
+from collections import Counter
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from reviews.models import Category, Comment, Review, Title, User
+
+
+@pytest.mark.django_db(transaction=True)
+class Test23Dataset:
+
+    OPTIONS = {
+        'users': 30, 'categories': 5, 'genres': 8, 'titles': 40,
+        'reviews': 300, 'comments': 200, 'batch_size': 50,
+    }
+
+    def generate(self, **options):
+        call_command(
+            'generate_dataset', stdout=StringIO(),
+            **{**self.OPTIONS, **options}
+        )
+
+    def snapshot(self):
+        return (
+            list(Title.objects.order_by('id').values_list(
+                'id', 'name', 'year', 'category_id', 'rating'
+            )),
+            list(Review.objects.order_by('id').values_list(
+                'title_id', 'author_id', 'score', 'text'
+            )),
+            list(Comment.objects.order_by('id').values_list(
+                'review_id', 'author_id'
+            )),
+        )
+
+    def test_01_volumes_and_unique_reviews(self):
+        self.generate()
+        assert User.objects.count() == 30
+        assert Category.objects.count() == 5
+        assert Title.objects.count() == 40
+        assert Review.objects.count() == 300
+        assert Comment.objects.count() == 200
+        pairs = list(Review.objects.values_list('author_id', 'title_id'))
+        assert len(set(pairs)) == len(pairs), (
+            'Автор не может оставить два отзыва на одно произведение.'
+        )
+        counts = Counter(title_id for _, title_id in pairs)
+        assert max(counts.values()) <= 30
+        assert counts.most_common(1)[0][1] > 2 * 300 / 40, (
+            'Отзывы должны распределяться по произведениям неравномерно.'
+        )
+        title = Title.objects.get(pk=counts.most_common(1)[0][0])
+        assert title.review_count == counts[title.pk], (
+            'После генерации рейтинги произведений должны быть пересчитаны.'
+        )
+
+    def test_02_same_seed_same_data(self):
+        self.generate(seed=7)
+        first = self.snapshot()
+        call_command('flush', interactive=False, stdout=StringIO())
+        self.generate(seed=7)
+        assert self.snapshot() == first, (
+            'Один seed на пустой базе должен давать одни и те же данные.'
+        )
+        call_command('flush', interactive=False, stdout=StringIO())
+        self.generate(seed=8)
+        assert self.snapshot() != first
+
+    def test_03_append_and_limits(self):
+        self.generate()
+        self.generate()
+        assert Title.objects.count() == 80
+        assert User.objects.count() == 60
+        with pytest.raises(CommandError):
+            self.generate(titles=2, users=3, reviews=7)
+
+    def test_04_reviews_up_to_capacity(self):
+        # при сильном перекосе последнее произведение выбирается с
+        # вероятностью около 1e-9: добирать отзывы нужно без него
+        self.generate(users=2, titles=50, reviews=100, comments=0, skew=5)
+        assert set(Counter(
+            Review.objects.values_list('title_id', flat=True)
+        ).values()) == {2}, (
+            'Отзывы должны распределяться и при числе отзывов, равном '
+            'произведениям * авторам.'
+        )
@@ -0,0 +1,58 @@
+import logging
+
+import pytest
+from django.db import connection
+
+from api.middleware import QueryRecorder, query_shape
+from reviews.models import Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test24SqlInstrumentation:
+
+    def test_01_query_shape(self):
+        assert query_shape(
+            'SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 5'
+        ) == query_shape('SELECT * FROM t WHERE id IN (%s) LIMIT 10'), (
+            'Запросы, отличающиеся только значениями, должны иметь '
+            'одну форму.'
+        )
+        assert query_shape('SELECT "T3"."id" FROM t') == (
+            'SELECT "T3"."id" FROM t'
+        )
+
+    def test_02_duplicates(self):
+        titles = [
+            Title.objects.create(name=f'Произведение {idx}', year=2000)
+            for idx in range(3)
+        ]
+        recorder = QueryRecorder(slow_ms=1000)
+        with connection.execute_wrapper(recorder):
+            for title in titles:
+                Title.objects.filter(pk=title.pk).first()
+            Title.objects.count()
+        assert recorder.count == 4
+        assert len(recorder.duplicates(3)) == 1, (
+            'Запросы, различающиеся только параметрами, должны '
+            'считаться повторами (N+1).'
+        )
+        assert recorder.duplicates(4) == []
+
+    def test_03_middleware(self, client, settings, caplog):
+        settings.SQL_INSTRUMENTATION_SAMPLE_RATE = 1
+        settings.SQL_SLOW_QUERY_MS = 0
+        with caplog.at_level(logging.WARNING, logger='api.sql'):
+            response = client.get('/api/v1/titles/')
+        timing = response.get('Server-Timing', '')
+        assert timing.startswith('db;dur=') and 'total;dur=' in timing, (
+            'Для выбранного запроса в ответе должен быть заголовок '
+            'Server-Timing с временем в БД.'
+        )
+        assert any(
+            'TitleViewSet.list' in record.getMessage()
+            for record in caplog.records
+        ), 'Медленные запросы должны логироваться с именем действия.'
+
+        settings.SQL_INSTRUMENTATION_SAMPLE_RATE = 0
+        response = client.get('/api/v1/titles/')
+        assert not response.has_header('Server-Timing')
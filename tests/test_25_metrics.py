@@ -0,0 +1,78 @@
+import pytest
+
+from api.metrics import MmapStore, Registry
+from tests.utils import sample
+
+
+@pytest.mark.django_db(transaction=True)
+class Test25Metrics:
+
+    METRICS_URL = '/api/v1/metrics/'
+
+    def make_registry(self):
+        registry = Registry()
+        requests = registry.counter('requests_total', 'Запросы', ('route',))
+        duration = registry.histogram(
+            'duration_seconds', 'Время', ('route',), buckets=(0.1, 1)
+        )
+        return registry, requests, duration
+
+    def test_01_exposition(self, settings):
+        settings.METRICS_MULTIPROCESS_DIR = None
+        registry, requests, duration = self.make_registry()
+        requests.inc(route='title-list')
+        requests.inc(2, route='title-list')
+        duration.observe(0.5, route='title-list')
+        duration.observe(5, route='title-list')
+        text = registry.expose()
+        assert '# TYPE requests_total counter' in text
+        assert '# TYPE duration_seconds histogram' in text
+        assert sample(text, 'requests_total{route="title-list"}') == 3
+        assert sample(
+            text, 'duration_seconds_bucket{route="title-list",le="0.1"}'
+        ) == 0
+        assert sample(
+            text, 'duration_seconds_bucket{route="title-list",le="1"}'
+        ) == 1, 'Корзины гистограммы должны быть накопительными.'
+        assert sample(
+            text, 'duration_seconds_bucket{route="title-list",le="+Inf"}'
+        ) == 2
+        assert sample(text, 'duration_seconds_sum{route="title-list"}') == 5.5
+        with pytest.raises(ValueError):
+            requests.inc(path='/')
+
+    def test_02_multiprocess_files(self, settings, tmp_path):
+        settings.METRICS_MULTIPROCESS_DIR = str(tmp_path)
+        registry, requests, duration = self.make_registry()
+        requests.inc(route='title-list')
+        # файл другого воркера gunicorn
+        other = MmapStore(tmp_path / 'metrics_1.db')
+        other.inc('requests_total requests_total{route="title-list"}', 4)
+        for idx in range(3000):
+            # рост файла за начальный размер
+            other.inc(f'requests_total requests_total{{route="r{idx}"}}', 1)
+        assert sample(
+            registry.expose(), 'requests_total{route="title-list"}'
+        ) == 5, 'Метрики должны суммироваться по файлам всех процессов.'
+        reopened = MmapStore(tmp_path / 'metrics_1.db')
+        assert dict(reopened.items()) == dict(other.items())
+
+    def test_03_endpoint(self, admin_client, user_client):
+        admin_client.get('/api/v1/titles/')
+        response = user_client.get(self.METRICS_URL)
+        assert response.status_code == 403, (
+            'Метрики должны быть доступны только администратору.'
+        )
+        response = admin_client.get(self.METRICS_URL)
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain')
+        text = response.content.decode()
+        assert sample(
+            text,
+            'api_requests_total{route="title-list",method="GET",status="200"}'
+        ) >= 1, 'Запросы должны считаться по имени маршрута из api/urls.py.'
+        assert 'api_db_duration_seconds_count{route="title-list"' in text
+        assert 'api_serializer_duration_seconds_count{route="title-list"}' in (
+            text
+        ), 'Время сериализации списка должно попадать в метрики.'
+        assert 'api_page_number_bucket{route="title-list"' in text
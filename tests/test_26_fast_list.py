@@ -0,0 +1,84 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+
+from api.fast_list import compile_serializer
+from api.serializers import (CommentSerializer, ReviewSerializer,
+                             TitleGetSerializer, UserSerializer)
+from reviews.models import Comment, Genre, Review, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test26FastList:
+
+    @pytest.fixture
+    def dataset(self, settings):
+        settings.RESPONSE_CACHE_ALIAS = None
+        call_command(
+            'generate_dataset', users=10, categories=3, genres=6, titles=30,
+            reviews=120, comments=150, stdout=StringIO(),
+        )
+        # произведение без категории, жанров и рейтинга
+        Title.objects.create(name='Без категории', year=2000)
+        # порядок жанров с одинаковым именем тоже должен совпасть
+        Genre.objects.filter(pk__in=(1, 2, 3)).update(name='Жанр')
+
+    def get_urls(self):
+        title = Title.objects.order_by('-review_count').first()
+        review = Review.objects.filter(title=title).order_by('id').first()
+        comment = Comment.objects.order_by('id').first()
+        return [
+            '/api/v1/titles/',
+            '/api/v1/titles/?page=2&page_size=10',
+            '/api/v1/titles/?page_size=100',
+            '/api/v1/titles/?pagination=cursor&page_size=7',
+            '/api/v1/titles/?ordering=-rating',
+            '/api/v1/titles/?genre=genre-1,genre-2',
+            '/api/v1/titles/?search=фильм',
+            f'/api/v1/titles/{title.id}/reviews/?page_size=100',
+            f'/api/v1/titles/{title.id}/reviews/?pagination=cursor',
+            f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/',
+            f'/api/v1/titles/{comment.review.title_id}/reviews/'
+            f'{comment.review_id}/comments/?page_size=100',
+        ]
+
+    def test_01_byte_identical(self, client, settings, dataset):
+        for url in self.get_urls():
+            settings.FAST_LIST_SERIALIZATION = False
+            with CaptureQueriesContext(connection) as slow:
+                expected = client.get(url)
+            settings.FAST_LIST_SERIALIZATION = True
+            with CaptureQueriesContext(connection) as fast:
+                response = client.get(url)
+            assert response.status_code == expected.status_code == 200, url
+            assert response.content == expected.content, (
+                f'Быстрая сериализация `{url}` должна совпадать с обычной '
+                f'побайтно.'
+            )
+            assert len(fast) <= len(slow), url
+
+    def test_02_compiled_serializers(self):
+        for serializer_class in (
+            TitleGetSerializer, ReviewSerializer, CommentSerializer
+        ):
+            assert compile_serializer(serializer_class) is not None, (
+                f'{serializer_class.__name__} должен компилироваться.'
+            )
+
+        class MethodSerializer(UserSerializer):
+            greeting = serializers.SerializerMethodField()
+
+            class Meta(UserSerializer.Meta):
+                fields = ('username', 'greeting')
+
+            def get_greeting(self, obj):
+                return f'Привет, {obj.username}'
+
+        assert compile_serializer(MethodSerializer) is None, (
+            'Сериализатор с неподдержанными полями должен обрабатываться '
+            'обычным list.'
+        )
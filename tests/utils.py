@@ -1,3 +1,4 @@
+import re
 from http import HTTPStatus
 
 
@@ -305,3 +306,9 @@ def check_fields(obj_type, url_pattern, obj, expected_data, detail=False):
         f'данные {obj_types[obj_type]}{results_in_msg}. Поле `id` не '
         'найдено или не является целым числом.'
     )
+
+
+def sample(text, line):
+    """Значение метрики `line` из текста экспозиции Prometheus."""
+    match = re.search(rf'^{re.escape(line)} (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else None